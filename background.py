@@ -0,0 +1,61 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+#Runs one job on a background thread however many times it gets triggered.
+#Triggers that arrive while the job is running collapse into a single rerun,
+#so a burst of requests never queues up more than one extra pass.
+#trigger_later does the same after a delay, with at most one delayed run waiting.
+
+
+class CoalescingRunner(object):
+	def __init__(self, job):
+		self.job = job
+		self._executor = ThreadPoolExecutor(max_workers=1)
+		self._lock = threading.Lock()
+		self._running = False
+		self._rerun = False
+		self._timer = None
+		self.runs = 0
+
+	def trigger(self):
+		with self._lock:
+			if self._running:
+				self._rerun = True
+				return False
+			self._running = True
+		self._executor.submit(self._run)
+		return True
+
+	def trigger_later(self, delay):
+		with self._lock:
+			if self._timer is not None:
+				return False
+			self._timer = threading.Timer(delay, self._timer_fired)
+			self._timer.daemon = True
+			self._timer.start()
+		return True
+
+	def _timer_fired(self):
+		with self._lock:
+			self._timer = None
+		self.trigger()
+
+	def is_running(self):
+		with self._lock:
+			return self._running
+
+	def _run(self):
+		while True:
+			try:
+				self.job()
+			except Exception:
+				logger.exception("Background job %s failed", getattr(self.job, '__name__', self.job))
+			with self._lock:
+				self.runs += 1
+				if not self._rerun:
+					self._running = False
+					return
+				self._rerun = False
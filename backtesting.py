@@ -0,0 +1,111 @@
+from collections import namedtuple
+
+import numpy as np
+
+from suggestion_engine import stop_losses
+
+#Replays stored suggestions against the cached close history. Each line item of every suggestion
+#is one row of an (items x days) price matrix, so returns, drawdowns and stop loss hits for
+#thousands of suggestions come out of a handful of numpy operations instead of a python loop.
+#A position is bought at the close of the last trading day on or before the suggestion was made, and
+#held for `horizon` trading days (or until the history runs out). The price the investor was shown is
+#that close cut to whole dollars, so it is not used for returns. The stop is worked out the same way the
+#suggestion's was, entry close minus suggestion_engine.stop_losses.
+
+#One entry per evaluated suggestion. Returns and drawdowns are fractions, days_held counts trading days
+BacktestResult = namedtuple('BacktestResult', ['suggestion_ids', 'made_on', 'days_held', 'hold_return', 'stop_return', 'max_drawdown', 'stops_hit', 'positions', 'skipped_positions'])
+
+
+def price_matrix(records):
+	#records is {ticker: PriceRecord}, newest close first. Returns (tickers, calendar, closes): tickers sorted,
+	#calendar every date any ticker has (oldest first), closes[ticker, day] carried forward over days a
+	#ticker has no close and nan before its first one
+	tickers = np.array(sorted(records))
+	if not len(tickers):
+		return tickers, np.array([], dtype='datetime64[D]'), np.empty((0, 0))
+	dates = [np.array(records[ticker].dates, dtype='datetime64[D]') for ticker in tickers]
+	values = np.concatenate([np.frombuffer(records[ticker].closes, dtype=np.float64) if len(records[ticker].closes) else np.empty(0) for ticker in tickers])
+	rows = np.repeat(np.arange(len(tickers)), [len(ticker_dates) for ticker_dates in dates])
+	dates = np.concatenate(dates)
+	calendar = np.unique(dates)
+	closes = np.full((len(tickers), len(calendar)), np.nan)
+	closes[rows, np.searchsorted(calendar, dates)] = values
+	known = ~np.isnan(closes)
+	last_known = np.maximum.accumulate(np.where(known, np.arange(len(calendar)), 0), axis=1)
+	closes = closes[np.arange(len(tickers))[:, None], last_known]
+	closes[~np.maximum.accumulate(known, axis=1)] = np.nan
+	return tickers, calendar, closes
+
+
+def _empty(skipped):
+	return BacktestResult(np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), skipped)
+
+
+def run(suggestions, items, records, horizon=None, end=None):
+	#suggestions is (ids, dates made), items is (suggestion ids, tickers, shares, prices shown) with one entry per
+	#line item, all parallel sequences, the shown prices are ignored. end (a date) cuts every holding period off there.
+	#Line items without history for their entry day are skipped.
+	made_ids = np.asarray(suggestions[0], dtype=np.int64)
+	made_dates = np.asarray(suggestions[1], dtype='datetime64[D]')
+	suggestion_ids = np.asarray(items[0], dtype=np.int64)
+	tickers = np.asarray(items[1])
+	shares = np.asarray(items[2], dtype=np.float64)
+	#Dates are converted once per suggestion rather than once per line item
+	by_id = np.argsort(made_ids)
+	made_on = made_dates[by_id][np.minimum(np.searchsorted(made_ids[by_id], suggestion_ids), max(len(made_ids) - 1, 0))] if len(made_ids) else np.empty(0, dtype='datetime64[D]')
+	names, calendar, closes = price_matrix(records)
+	if not len(calendar) or not len(suggestion_ids):
+		return _empty(len(suggestion_ids))
+
+	row = np.minimum(np.searchsorted(names, tickers), len(names) - 1)
+	entry = np.searchsorted(calendar, made_on, side='right') - 1
+	last_day = len(calendar) - 1 if end is None else np.searchsorted(calendar, np.datetime64(end, 'D'), side='right') - 1
+	exit_day = np.full(len(entry), last_day) if horizon is None else np.minimum(entry + horizon, last_day)
+	usable = (names[row] == tickers) & (entry >= 0) & (exit_day > entry)
+	#nan compares false, so a ticker without a close on its entry day is left out here too
+	usable[usable] = closes[row[usable], entry[usable]] > 0
+	if not usable.any():
+		return _empty(len(suggestion_ids))
+	skipped = len(suggestion_ids) - int(usable.sum())
+	suggestion_ids, shares, made_on, row, entry, exit_day = (values[usable] for values in (suggestion_ids, shares, made_on, row, entry, exit_day))
+
+	#path[i, t] is the close t trading days after entry, the exit close repeats past the end of the holding period
+	held_days = exit_day - entry
+	offsets = np.arange(held_days.max() + 1)
+	path = closes[row[:, None], entry[:, None] + np.minimum(offsets[None, :], held_days[:, None])]
+
+	#Sold at the first close at or under the stop, a stop of zero (no rise before the suggestion) is never hit
+	entry_close = path[:, 0]
+	previous = np.where(entry > 0, closes[row, np.maximum(entry - 1, 0)], np.nan)
+	stop_level = entry_close - stop_losses(entry_close, previous)
+	hit = (path[:, 1:] <= stop_level[:, None]) & (offsets[None, 1:] <= held_days[:, None])
+	stopped = hit.any(axis=1)
+	stop_day = np.where(stopped, hit.argmax(axis=1) + 1, held_days)
+	stop_path = np.where(offsets[None, :] > stop_day[:, None], path[np.arange(len(path)), stop_day][:, None], path)
+
+	#Positions add up to one portfolio per suggestion, rows are grouped by sorting on the suggestion id
+	order = np.argsort(suggestion_ids, kind='mergesort')
+	grouped_ids = suggestion_ids[order]
+	starts = np.flatnonzero(np.concatenate(([True], grouped_ids[1:] != grouped_ids[:-1])))
+	weights = shares[order][:, None]
+	value = np.add.reduceat(weights * path[order], starts, axis=0)
+	stop_value = np.add.reduceat(weights * stop_path[order], starts, axis=0)
+	cost = value[:, 0]
+	with np.errstate(divide='ignore', invalid='ignore'):
+		hold_return = np.where(cost > 0, value[:, -1] / cost - 1, 0.0)
+		stop_return = np.where(cost > 0, stop_value[:, -1] / cost - 1, 0.0)
+		max_drawdown = np.nan_to_num(1 - value / np.maximum.accumulate(value, axis=1)).max(axis=1)
+	return BacktestResult(grouped_ids[starts], made_on[order][starts], held_days[order][starts], hold_return, stop_return, max_drawdown,
+		np.add.reduceat(stopped[order].astype(np.int64), starts), np.diff(np.append(starts, len(order))), skipped)
+
+
+def summarize(result):
+	#Headline numbers for a page or the command line
+	count = len(result.suggestion_ids)
+	if not count:
+		return dict(suggestions=0, positions=0, skipped_positions=result.skipped_positions)
+	return dict(suggestions=count, positions=int(result.positions.sum()), skipped_positions=result.skipped_positions,
+		mean_return=float(result.hold_return.mean()), median_return=float(np.median(result.hold_return)),
+		mean_return_with_stops=float(result.stop_return.mean()), win_rate=float((result.hold_return > 0).mean()),
+		mean_drawdown=float(result.max_drawdown.mean()), worst_drawdown=float(result.max_drawdown.max()),
+		stop_hit_rate=float(result.stops_hit.sum() / result.positions.sum()), mean_days_held=float(result.days_held.mean()))
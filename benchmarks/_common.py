@@ -0,0 +1,60 @@
+#Helpers shared by the benchmark scripts: a throwaway environment for the app, percentiles,
+#and saving results or comparing them against a saved baseline.
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def bench_env(work_dir, name, environ=None):
+	#Points the app at a database (which holds the price store too) and picture directory inside work_dir, with made up market data.
+	#Changes os.environ unless another mapping is given (e.g. a copy for a child process)
+	env = os.environ if environ is None else environ
+	env['DATABASE_URL'] = 'sqlite:///' + os.path.join(work_dir, name + '.db')
+	env['PROFILE_IMAGE_DIR'] = os.path.join(work_dir, 'profile_images')
+	env['MARKET_DATA_PROVIDER'] = 'synthetic'
+	env.setdefault('FLASKY_ADMIN', 'admin@example.com')
+	return env
+
+
+def setup(name):
+	#Call before importing Final_Project, returns the work directory
+	work_dir = tempfile.mkdtemp()
+	bench_env(work_dir, name)
+	if ROOT not in sys.path:
+		sys.path.insert(0, ROOT)
+	return work_dir
+
+
+def percentile(ordered, fraction):
+	#nearest rank
+	return ordered[min(int(fraction * len(ordered) + 0.5), len(ordered)) - 1] if ordered else 0.0
+
+
+def save_results(path, settings, results, **extra):
+	with open(path, 'w') as out:
+		json.dump(dict(settings=settings, results=results, **extra), out, indent=1)
+
+
+def load_results(path):
+	with open(path) as saved:
+		return json.load(saved).get('results', {})
+
+
+def compare(rows, tolerance, higher_is_better=('throughput',)):
+	#rows are (name, metric, baseline value, current value). A metric getting worse by more than tolerance,
+	#up for timings or down for the ones in higher_is_better, counts as a regression
+	regressions = []
+	print("\n{:>12} {:>10} {:>12} {:>12} {:>9}".format("name", "metric", "baseline", "now", "change"))
+	for name, metric, before, now in rows:
+		if not before:
+			continue
+		change = (now - before) / before
+		worse = -change if metric in higher_is_better else change
+		flag = ' <- regression' if worse > tolerance else ''
+		if flag:
+			regressions.append((name, metric))
+		print("{:>12} {:>10} {:>12.2f} {:>12.2f} {:>+8.1f}%{}".format(name, metric, before, now, change * 100, flag))
+	return regressions
@@ -0,0 +1,56 @@
+#Times the backtest engine on made up suggestions over synthetic price histories, no database involved.
+#Run from the project root: python benchmarks/bench_backtest.py -s 1000 5000 20000
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import backtesting
+from market_data import SyntheticProvider
+from suggestion_engine import SUGGESTIONS_PER_REQUEST
+
+
+def make_suggestions(count, tickers, records, days, seed):
+	#Each suggestion holds SUGGESTIONS_PER_REQUEST random tickers bought on a random day in the history
+	random = np.random.RandomState(seed)
+	newest = np.datetime64(records[tickers[0]].dates[0], 'D')
+	made_on = newest - random.randint(1, days, count)
+	picks = np.argsort(random.rand(count, len(tickers)), axis=1)[:, :SUGGESTIONS_PER_REQUEST]
+	suggestion_ids = np.repeat(np.arange(count), SUGGESTIONS_PER_REQUEST)
+	item_tickers = np.array(tickers)[picks.ravel()]
+	shares = random.randint(1, 200, len(suggestion_ids))
+	#the price shown is whatever the ticker closed at near the day it was suggested
+	prices = random.randint(20, 300, len(suggestion_ids))
+	return (np.arange(count), made_on), (suggestion_ids, item_tickers, shares, prices)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1000, 5000, 20000], help='suggestions per run')
+	parser.add_argument('-t', '--tickers', type=int, default=50)
+	parser.add_argument('-d', '--days', type=int, default=250, help='closes of history per ticker')
+	parser.add_argument('-n', '--horizon', type=int, default=20)
+	parser.add_argument('-r', '--repeat', type=int, default=5)
+	args = parser.parse_args()
+
+	tickers = ["T{}".format(number) for number in range(args.tickers)]
+	records = SyntheticProvider(seed=1).get_closes(tickers, args.days)
+	print("{} tickers x {} days, holding {} trading days".format(args.tickers, args.days, args.horizon))
+	print("{:>11} {:>10} {:>10} {:>16}".format("suggestions", "positions", "best ms", "suggestions/s"))
+	for size in args.sizes:
+		suggestions, items = make_suggestions(size, tickers, records, args.days, size)
+		timings = []
+		for _ in range(args.repeat):
+			start = time.time()
+			result = backtesting.run(suggestions, items, records, args.horizon)
+			timings.append(time.time() - start)
+		best = min(timings)
+		print("{:>11} {:>10} {:>10.1f} {:>16.0f}".format(size, int(result.positions.sum()), best * 1e3, size / best))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,99 @@
+#Login throughput under concurrency, hashing on the request threads against the process pool.
+#While the logins run a probe thread keeps requesting /the_perks to show how much the hashing
+#slows down everything else in the same worker.
+#Run from the project root: python benchmarks/bench_login.py -c 8 -r 200 --pool-workers 4
+import argparse
+import os
+import threading
+import time
+
+from _common import setup, percentile
+
+WORK_DIR = setup('bench_login')
+
+from Final_Project import create_app, services, db, Investor, HardCoded_Companies, seed_business_catalog
+from login_security import PasswordHasher, LoginThrottle
+
+app = create_app()
+
+PASSWORD = 'bench-login'
+
+
+def run(logins, concurrency, investors):
+	latencies = []
+	probe_latencies = []
+	lock = threading.Lock()
+	counter = iter(range(logins))
+	done = threading.Event()
+
+	def login_worker(worker_number):
+		client = app.test_client()
+		number = worker_number
+		while True:
+			with lock:
+				if next(counter, None) is None:
+					return
+			number = (number + concurrency) % investors
+			start = time.time()
+			response = client.post('/Investor_Login', data=dict(email="investor{}@example.com".format(number), password=PASSWORD))
+			elapsed = time.time() - start
+			if response.status_code != 302:
+				raise RuntimeError("login failed with {}".format(response.status_code))
+			with lock:
+				latencies.append(elapsed)
+
+	def probe():
+		client = app.test_client()
+		while not done.is_set():
+			start = time.time()
+			client.get('/the_perks')
+			probe_latencies.append(time.time() - start)
+			time.sleep(0.01)
+
+	prober = threading.Thread(target=probe)
+	prober.start()
+	threads = [threading.Thread(target=login_worker, args=(number,)) for number in range(concurrency)]
+	started = time.time()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	wall = time.time() - started
+	done.set()
+	prober.join()
+	latencies.sort()
+	probe_latencies.sort()
+	return len(latencies) / wall, percentile(latencies, 0.5), percentile(latencies, 0.95), percentile(probe_latencies, 0.5), percentile(probe_latencies, 0.95)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('-r', '--logins', type=int, default=100)
+	parser.add_argument('-c', '--concurrency', type=int, default=8)
+	parser.add_argument('--investors', type=int, default=50)
+	parser.add_argument('--pool-workers', type=int, default=os.cpu_count() or 2)
+	parser.add_argument('--method', default=app.config['PASSWORD_HASH_METHOD'])
+	args = parser.parse_args()
+
+	app.config['WTF_CSRF_ENABLED'] = False
+	#Every login here is a success, the throttle isn't what's being measured
+	services(app).login_throttle = LoginThrottle()
+	with app.app_context():
+		db.create_all()
+		seed_business_catalog(HardCoded_Companies)
+		password_hash = PasswordHasher(args.method, workers=0).hash(PASSWORD)
+		db.session.execute(Investor.__table__.insert(), [dict(username="investor{}".format(number), email="investor{}@example.com".format(number), password_hash=password_hash) for number in range(args.investors)])
+		db.session.commit()
+
+	print("{} logins, {} threads, {}".format(args.logins, args.concurrency, args.method))
+	print("{:>22} {:>10} {:>12} {:>12} {:>16} {:>16}".format("hashing", "logins/s", "p50 ms", "p95 ms", "other p50 ms", "other p95 ms"))
+	for label, workers in (("request thread", 0), ("{} process pool".format(args.pool_workers), args.pool_workers)):
+		services(app).password_hasher = PasswordHasher(args.method, workers=workers)
+		#warm the pool so process start up isn't counted
+		services(app).password_hasher.verify(password_hash, PASSWORD)
+		throughput, p50, p95, other_p50, other_p95 = run(args.logins, args.concurrency, args.investors)
+		print("{:>22} {:>10.1f} {:>12.1f} {:>12.1f} {:>16.1f} {:>16.1f}".format(label, throughput, p50 * 1e3, p95 * 1e3, other_p50 * 1e3, other_p95 * 1e3))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,55 @@
+#Times get_closes for each market data provider on the same batch of tickers.
+#The synthetic closes are recorded to a temporary directory first so the replay provider has something to serve.
+#Run from the project root: python benchmarks/bench_providers.py [--quandl]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import market_data
+
+QUANDL_TICKERS = ['VZ', 'CVX', 'CAT', 'IBM', 'XOM', 'PFE', 'MRK', 'PG', 'WMT', 'CSCO', 'MSFT', 'KO', 'JNJ', 'DIS', 'GE']
+
+
+def time_provider(provider, tickers, rows, repeat):
+	timings = []
+	for _ in range(repeat):
+		start = time.time()
+		closes = provider.get_closes(tickers, rows)
+		timings.append(time.time() - start)
+	usable = sum(1 for record in closes.values() if record is not None and record != "nope")
+	return min(timings), sum(timings) / len(timings), usable
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('-t', '--tickers', type=int, default=50, help='tickers per batch')
+	parser.add_argument('-r', '--rows', type=int, default=30, help='closes per ticker')
+	parser.add_argument('-n', '--repeat', type=int, default=20, help='batches per provider')
+	parser.add_argument('--quandl', action='store_true', help='also time the real quandl api (needs network, QUANDL_API_KEY)')
+	args = parser.parse_args()
+
+	if args.quandl:
+		#Real tickers so every provider gets the same batch
+		tickers = QUANDL_TICKERS[:args.tickers]
+	else:
+		tickers = ["T{}".format(number) for number in range(args.tickers)]
+	synthetic = market_data.SyntheticProvider()
+	replay = market_data.ReplayProvider(tempfile.mkdtemp())
+	for ticker, record in synthetic.get_closes(tickers, args.rows).items():
+		replay.record(ticker, record)
+	providers = [synthetic, replay]
+	if args.quandl:
+		providers.append(market_data.QuandlProvider(api_key=os.environ.get('QUANDL_API_KEY')))
+
+	print("{:>10} {:>12} {:>12} {:>8}".format("provider", "best ms", "mean ms", "usable"))
+	for provider in providers:
+		best, mean, usable = time_provider(provider, tickers, args.rows, args.repeat if provider.name != 'quandl' else 1)
+		print("{:>10} {:>12.2f} {:>12.2f} {:>8}".format(provider.name, best * 1e3, mean * 1e3, usable))
+
+
+if __name__ == '__main__':
+	main()
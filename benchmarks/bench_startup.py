@@ -0,0 +1,107 @@
+#Cold start of a web worker: how long a fresh interpreter takes to import Final_Project and build
+#the app with create_app, and which imports that time goes to (python -X importtime).
+#Every run is a new process so nothing is already imported.
+#Run from the project root: python benchmarks/bench_startup.py --save startup.json
+#and later: python benchmarks/bench_startup.py --baseline startup.json (exits 1 if start up got slower)
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import ROOT, bench_env, save_results, load_results, compare
+
+METRICS = ['process', 'import', 'create_app']
+
+#Runs in the child, prints the import and create_app times in seconds
+STARTUP = '''
+import time
+started = time.time()
+import Final_Project
+imported = time.time()
+Final_Project.create_app()
+print(imported - started, time.time() - imported)
+'''
+
+
+def child_env(work_dir):
+	env = bench_env(work_dir, 'startup', dict(os.environ))
+	env.pop('PYTHONPROFILEIMPORTTIME', None)
+	return env
+
+
+def start_once(env, importtime=False):
+	command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', STARTUP]
+	started = time.time()
+	child = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+	elapsed = time.time() - started
+	if child.returncode:
+		raise RuntimeError("start up failed:\n" + child.stderr)
+	import_seconds, create_seconds = (float(value) for value in child.stdout.split()[-2:])
+	return {'process': elapsed * 1e3, 'import': import_seconds * 1e3, 'create_app': create_seconds * 1e3}, child.stderr
+
+
+def import_breakdown(stderr, depth):
+	#-X importtime lines look like "import time:  self [us] | cumulative | <indent>package", nested imports
+	#are indented two spaces per level. Returns (cumulative ms, module) for Final_Project and its imports.
+	rows = []
+	inside = False
+	for line in reversed(stderr.splitlines()):
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+		level = (len(name) - len(name.lstrip()) - 1) // 2
+		if name.strip() == 'Final_Project':
+			inside = True
+			top = level
+		elif inside and level <= top:
+			break
+		if inside and level - top <= depth:
+			rows.append((int(cumulative_us) / 1e3, '  ' * (level - top) + name.strip()))
+	return rows
+
+
+def median(values):
+	ordered = sorted(values)
+	middle = len(ordered) // 2
+	return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('-n', '--runs', type=int, default=5, help='fresh interpreters to time, the median is reported')
+	parser.add_argument('-t', '--top', type=int, default=15, help='imports to list in the breakdown')
+	parser.add_argument('--depth', type=int, default=1, help='how many levels below Final_Project the breakdown goes')
+	parser.add_argument('--save', help='write the results to this json file')
+	parser.add_argument('--baseline', help='compare against results saved earlier with --save')
+	parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown before a metric counts as a regression')
+	args = parser.parse_args()
+
+	env = child_env(tempfile.mkdtemp())
+	#The first run also compiles bytecode, it isn't counted
+	start_once(env)
+	runs = [start_once(env)[0] for _ in range(args.runs)]
+	results = dict((metric, median([run[metric] for run in runs])) for metric in METRICS)
+	print("{} cold starts, median ms".format(args.runs))
+	for metric in METRICS:
+		print("{:>12} {:>9.1f}".format(metric, results[metric]))
+
+	#One more start with -X importtime, its own overhead makes the numbers a little higher
+	_, stderr = start_once(env, importtime=True)
+	breakdown = import_breakdown(stderr, args.depth)
+	print("\n{:>14}  {}".format("cumulative ms", "import"))
+	for cumulative_ms, name in sorted(breakdown, reverse=True)[:args.top]:
+		print("{:>14.1f}  {}".format(cumulative_ms, name))
+
+	if args.save:
+		save_results(args.save, vars(args), results, imports=dict((name.strip(), cumulative_ms) for cumulative_ms, name in breakdown))
+	if args.baseline:
+		baseline = load_results(args.baseline)
+		regressions = compare([('start up', metric + ' ms', baseline.get(metric), results[metric]) for metric in METRICS], args.tolerance)
+		if regressions:
+			sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
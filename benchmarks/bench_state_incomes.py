@@ -0,0 +1,42 @@
+#Compares the old per request parse of state_incomes.csv with the table loaded at startup.
+#Run from the project root: python benchmarks/bench_state_incomes.py
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import petl as etl
+from state_incomes import StateIncomeTable
+
+CSV_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'state_incomes.csv'))
+
+
+def per_request_parse(state):
+	#What Calculate_amount_to_invest_per_month used to do on every suggestion request
+	State_Incomes = {}
+	state_income_tuples = etl.fromcsv(CSV_PATH)
+	for item in state_income_tuples[1:]:
+		State_Incomes[item[0]] = int(item[1])
+	return int(State_Incomes[state]/60)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('-n', '--number', type=int, default=2000, help='lookups per measurement')
+	parser.add_argument('-s', '--state', default='michigan')
+	args = parser.parse_args()
+
+	table = StateIncomeTable(CSV_PATH)
+	assert table.monthly_investment(args.state) == per_request_parse(args.state)
+
+	old = min(timeit.repeat(lambda: per_request_parse(args.state), number=args.number, repeat=3)) / args.number
+	new = min(timeit.repeat(lambda: table.monthly_investment(args.state), number=args.number, repeat=3)) / args.number
+	print("per request csv parse : {:10.2f} us/request".format(old * 1e6))
+	print("startup loaded table  : {:10.2f} us/request".format(new * 1e6))
+	print("saved per request     : {:10.2f} us ({:.0f}x faster)".format((old - new) * 1e6, old / new))
+
+
+if __name__ == '__main__':
+	main()
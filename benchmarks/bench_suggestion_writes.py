@@ -0,0 +1,66 @@
+#Counts the database round trips it takes to save one suggestion, old ORM path against save_suggestion.
+#Uses a throwaway sqlite database. Run from the project root: python benchmarks/bench_suggestion_writes.py
+import argparse
+import time
+
+from _common import setup
+
+WORK_DIR = setup('bench')
+
+from sqlalchemy import event
+from Final_Project import create_app, db, Business, Investor, Suggestion, SuggestionItem, seed_business_catalog, save_suggestion
+
+app = create_app()
+
+
+def orm_write(db_session, investor_id, results):
+	#What get_or_create_suggestion used to do: a lookup per business, then appending to the relationships
+	suggestion = Suggestion(investor_id=investor_id)
+	for position, (company, number_of_stocks_bought, current_price, industry, link_to_comp_info, ticker_symbol) in enumerate(results):
+		business = db_session.query(Business).filter_by(ticker_symbol=ticker_symbol).first()
+		suggestion.businesses.append(business)
+		suggestion.items.append(SuggestionItem(business=business, position=position, shares=number_of_stocks_bought, price=current_price))
+	db_session.add(suggestion)
+	db_session.commit()
+
+
+def measure(write, investor_id, results, repeat):
+	statements = [0]
+	def count(conn, cursor, statement, parameters, context, executemany):
+		statements[0] += 1
+	event.listen(db.engine, 'before_cursor_execute', count)
+	start = time.time()
+	for _ in range(repeat):
+		write(db.session, investor_id, results)
+		#a new request starts with an empty session
+		db.session.remove()
+	elapsed = time.time() - start
+	event.remove(db.engine, 'before_cursor_execute', count)
+	return statements[0] / float(repeat), elapsed / repeat
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('-n', '--repeat', type=int, default=50, help='suggestions written per measurement')
+	parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1, 9, 50], help='companies per suggestion')
+	args = parser.parse_args()
+
+	with app.app_context():
+		db.create_all()
+		companies = [("Company {}".format(number), "T{}".format(number), "Industry", "http://example.com/{}".format(number)) for number in range(max(args.sizes))]
+		seed_business_catalog(companies)
+		investor = Investor(username='bench', email='bench@example.com', password_hash='x')
+		db.session.add(investor)
+		db.session.commit()
+		investor_id = investor.id
+
+		print("{:>9} {:>22} {:>22}".format("companies", "old round trips / time", "new round trips / time"))
+		for size in args.sizes:
+			results = [(company[0], 3, 100 + number, company[2], company[3], company[1]) for number, company in enumerate(companies[:size])]
+			old_statements, old_time = measure(orm_write, investor_id, results, args.repeat)
+			new_statements, new_time = measure(save_suggestion, investor_id, results, args.repeat)
+			print("{:>9} {:>11.1f} {:>7.2f}ms {:>11.1f} {:>7.2f}ms".format(size, old_statements, old_time * 1e3, new_statements, new_time * 1e3))
+
+
+if __name__ == '__main__':
+	main()
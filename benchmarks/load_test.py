@@ -0,0 +1,146 @@
+#Load test for the hot routes. Boots the app against a throwaway sqlite database and the synthetic
+#market data provider, seeds investors, businesses and past suggestions, then hammers each route
+#and reports throughput and p50/p95/p99 latency.
+#Run from the project root: python benchmarks/load_test.py --save baseline.json
+#and later: python benchmarks/load_test.py --baseline baseline.json (exits 1 if a route got slower)
+import argparse
+import random
+import sys
+import threading
+import time
+
+from _common import setup, percentile, save_results, load_results, compare
+
+WORK_DIR = setup('load_test')
+
+from Final_Project import create_app, services, db, Investor, HardCoded_Companies, seed_business_catalog, save_suggestion, fetch_price_batch
+
+app = create_app()
+
+PASSWORD = 'load-test'
+ROUTES = ['suggestions', 'history', 'businesses', 'login']
+#A successful login redirects, every other route renders a page
+EXPECTED_STATUS = dict(suggestions=200, history=200, businesses=200, login=302)
+
+
+def seed(investors, businesses, suggestions):
+	companies = list(HardCoded_Companies) + [("Load Test Company {}".format(number), "LT{}".format(number), "Industry {}".format(number % 7), "https://example.com/{}".format(number)) for number in range(max(businesses - len(HardCoded_Companies), 0))]
+	seed_business_catalog(companies)
+	#Prices are already in the store, like a running site with the refresh worker going
+	services(app).price_store.put_many(fetch_price_batch([company[1] for company in companies]))
+	#Hashing is slow on purpose, every seeded investor shares one hash
+	password_hash = services(app).password_hasher.hash(PASSWORD)
+	db.session.execute(Investor.__table__.insert(), [dict(username="investor{}".format(number), email="investor{}@example.com".format(number), password_hash=password_hash) for number in range(investors)])
+	db.session.commit()
+	investor_ids = [row[0] for row in db.session.query(Investor.id)]
+	rnd = random.Random(0)
+	for _ in range(suggestions):
+		picked = rnd.sample(companies, min(9, len(companies)))
+		save_suggestion(db.session, rnd.choice(investor_ids), [(company[0], rnd.randint(1, 40), rnd.randint(20, 400), company[2], company[3], company[1]) for company in picked])
+	db.session.remove()
+	return len(companies)
+
+
+def logged_in_client(number):
+	client = app.test_client()
+	response = client.post('/Investor_Login', data=dict(email="investor{}@example.com".format(number), password=PASSWORD))
+	if response.status_code != 302:
+		raise RuntimeError("investor{} could not log in".format(number))
+	return client
+
+
+def make_request(route, client, number, rnd, states, cold):
+	if route == 'suggestions':
+		if cold:
+			services(app).suggestion_cache.invalidate()
+		return client.post('/User_Investment_Suggestions', data=dict(State=rnd.choice(states), New_Data_Request='no'))
+	elif route == 'history':
+		return client.get('/Suggestion_History')
+	elif route == 'businesses':
+		return client.get('/Business_Data_At_Your_Fingertips')
+	else:
+		return app.test_client().post('/Investor_Login', data=dict(email="investor{}@example.com".format(number), password=PASSWORD))
+
+
+def run_route(route, requests_per_route, concurrency, investors, cold):
+	states = [state for state, _ in services(app).state_income_table.choices()]
+	latencies = []
+	errors = [0]
+	lock = threading.Lock()
+	counter = iter(range(requests_per_route))
+
+	def worker(worker_number):
+		number = worker_number % investors
+		client = logged_in_client(number)
+		rnd = random.Random(worker_number)
+		while True:
+			with lock:
+				if next(counter, None) is None:
+					return
+			start = time.time()
+			response = make_request(route, client, number, rnd, states, cold)
+			elapsed = time.time() - start
+			with lock:
+				latencies.append(elapsed)
+				if response.status_code != EXPECTED_STATUS[route]:
+					errors[0] += 1
+
+	threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+	started = time.time()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	wall = time.time() - started
+	return summarize(latencies, wall, errors[0])
+
+
+def summarize(latencies, wall, errors):
+	ordered = sorted(latencies)
+	return dict(requests=len(ordered), errors=errors, throughput=len(ordered) / wall if wall else 0.0,
+		p50=percentile(ordered, 0.50) * 1e3, p95=percentile(ordered, 0.95) * 1e3, p99=percentile(ordered, 0.99) * 1e3)
+
+
+def baseline_rows(results, baseline):
+	#Latency going up or throughput going down counts against a route
+	return [(route, metric, baseline[route][metric], now[metric]) for route, now in results.items() if route in baseline for metric in ('throughput', 'p50', 'p95', 'p99')]
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--investors', type=int, default=200)
+	parser.add_argument('--businesses', type=int, default=100)
+	parser.add_argument('--suggestions', type=int, default=2000, help='past suggestions spread across the investors')
+	parser.add_argument('-r', '--requests', type=int, default=300, help='requests per route')
+	parser.add_argument('-c', '--concurrency', type=int, default=4)
+	parser.add_argument('--routes', nargs='+', choices=ROUTES, default=ROUTES)
+	parser.add_argument('--cold', action='store_true', help='empty the suggestion cache before every suggestion request')
+	parser.add_argument('--save', help='write the results to this json file')
+	parser.add_argument('--baseline', help='compare against results saved earlier with --save')
+	parser.add_argument('--tolerance', type=float, default=0.10, help='allowed slowdown before a metric counts as a regression')
+	args = parser.parse_args()
+
+	app.config['WTF_CSRF_ENABLED'] = False
+	app.extensions['mail'].suppress = True
+	with app.app_context():
+		db.create_all()
+		started = time.time()
+		business_count = seed(args.investors, args.businesses, args.suggestions)
+		print("Seeded {} investors, {} businesses and {} suggestions in {:.1f}s ({})".format(args.investors, business_count, args.suggestions, time.time() - started, WORK_DIR))
+
+	results = {}
+	print("\n{:>12} {:>8} {:>7} {:>10} {:>9} {:>9} {:>9}".format("route", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+	for route in args.routes:
+		results[route] = run_route(route, args.requests, args.concurrency, args.investors, args.cold)
+		print("{:>12} {requests:>8} {errors:>7} {throughput:>10.1f} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}".format(route, **results[route]))
+
+	if args.save:
+		save_results(args.save, vars(args), results)
+	if args.baseline:
+		regressions = compare(baseline_rows(results, load_results(args.baseline)), args.tolerance)
+		if regressions:
+			sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,140 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import Table, Column, String, LargeBinary, Float, select, exc
+
+#Content addressed storage for uploaded images. A blob's key is the sha256 of its bytes,
+#so the same picture is only stored once and a key doubles as a perfect ETag.
+#Blobs live in the app database so every process (and every new dyno) sees them, a directory
+#on local disk only keeps copies of the ones this machine has already read.
+
+MAGIC_NUMBERS = [(b'\xff\xd8\xff', 'image/jpeg'), (b'\x89PNG\r\n\x1a\n', 'image/png'), (b'GIF87a', 'image/gif'), (b'GIF89a', 'image/gif')]
+
+
+def sniff_mimetype(data):
+	for magic, mimetype in MAGIC_NUMBERS:
+		if data.startswith(magic):
+			return mimetype
+	return 'application/octet-stream'
+
+
+def make_thumbnail(data, max_size):
+	#Returns (bytes, mimetype) scaled to fit in max_size, or the original when pillow
+	#isn't installed or can't read the upload
+	try:
+		from PIL import Image
+	except ImportError:
+		return data, sniff_mimetype(data)
+	try:
+		image = Image.open(io.BytesIO(data))
+		image_format = image.format
+		if image.width <= max_size[0] and image.height <= max_size[1]:
+			return data, Image.MIME.get(image_format, sniff_mimetype(data))
+		image.thumbnail(max_size)
+		if image_format not in ('JPEG', 'PNG', 'GIF'):
+			image_format = 'PNG'
+		if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+			image = image.convert('RGB')
+		output = io.BytesIO()
+		image.save(output, format=image_format)
+		return output.getvalue(), Image.MIME[image_format]
+	except (IOError, OSError, ValueError):
+		return data, sniff_mimetype(data)
+
+
+def blob_table(metadata, name):
+	return Table(name, metadata,
+		Column('key', String(64), primary_key=True),
+		Column('data', LargeBinary, nullable=False),
+		Column('created_at', Float, nullable=False))
+
+
+class BlobStore(object):
+	#get and modified_at raise KeyError for a key that was never stored
+	def __init__(self, engine, table, cache_dir=None):
+		self.engine = engine
+		self.table = table
+		self.cache_dir = cache_dir
+		self._schema_ready = False
+		self._schema_lock = threading.Lock()
+
+	def _connect(self):
+		if not self._schema_ready:
+			with self._schema_lock:
+				if not self._schema_ready:
+					#Already there when the schema came from create_all or the migrations
+					self.table.metadata.create_all(self.engine, tables=[self.table])
+					self._schema_ready = True
+		return self.engine
+
+	def path(self, key):
+		return os.path.join(self.cache_dir, key[:2], key[2:])
+
+	def put(self, data):
+		#The blob is committed before put returns, so a row can point at the key straight away
+		key = hashlib.sha256(data).hexdigest()
+		engine = self._connect()
+		if engine.execute(select([self.table.c.key]).where(self.table.c.key == key)).first() is None:
+			try:
+				engine.execute(self.table.insert().values(key=key, data=data, created_at=time.time()))
+			except exc.IntegrityError:
+				#Someone stored the same bytes first
+				pass
+		return key
+
+	def get(self, key):
+		if self.cache_dir:
+			try:
+				with open(self.path(key), 'rb') as blob_file:
+					return blob_file.read()
+			except (IOError, OSError):
+				pass
+		row = self._connect().execute(select([self.table.c.data, self.table.c.created_at]).where(self.table.c.key == key)).first()
+		if row is None:
+			raise KeyError(key)
+		if self.cache_dir:
+			self._cache(key, row.data, row.created_at)
+		return row.data
+
+	def _cache(self, key, data, created_at):
+		path = self.path(key)
+		directory = os.path.dirname(path)
+		try:
+			if not os.path.isdir(directory):
+				os.makedirs(directory, exist_ok=True)
+			#Write to a temp file and rename so readers never see half a blob
+			handle, temp_path = tempfile.mkstemp(dir=directory)
+			with os.fdopen(handle, 'wb') as blob_file:
+				blob_file.write(data)
+			os.utime(temp_path, (created_at, created_at))
+			os.replace(temp_path, path)
+		except (IOError, OSError):
+			#The copy is only a shortcut, the database still has the blob
+			pass
+
+	def modified_at(self, key):
+		if self.cache_dir and os.path.exists(self.path(key)):
+			return os.path.getmtime(self.path(key))
+		created_at = self._connect().execute(select([self.table.c.created_at]).where(self.table.c.key == key)).scalar()
+		if created_at is None:
+			raise KeyError(key)
+		return created_at
+
+	def exists(self, key):
+		return self._connect().execute(select([self.table.c.key]).where(self.table.c.key == key)).first() is not None
+
+	def cached_keys(self):
+		#Keys with a copy in cache_dir, skipping any temp file a crashed write left behind
+		if not self.cache_dir or not os.path.isdir(self.cache_dir):
+			return
+		for prefix in sorted(os.listdir(self.cache_dir)):
+			directory = os.path.join(self.cache_dir, prefix)
+			if len(prefix) != 2 or not os.path.isdir(directory):
+				continue
+			for rest in sorted(os.listdir(directory)):
+				if len(prefix + rest) == 64:
+					yield prefix + rest
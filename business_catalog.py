@@ -0,0 +1,64 @@
+import hashlib
+import threading
+from collections import namedtuple
+
+#In memory snapshot of the business catalog for the read only pages. It is rebuilt only
+#when the catalog version (row count, newest id) moves, i.e. when a business is added,
+#and each business's list item is rendered once per build instead of once per view.
+
+CatalogBusiness = namedtuple('CatalogBusiness', ['id', 'company_name', 'ticker_symbol', 'industry', 'link_to_comp_info'])
+
+#businesses are in id order, fragments[i] is the pre-rendered html for businesses[i],
+#by_industry maps an industry key to the positions of its businesses
+CatalogSnapshot = namedtuple('CatalogSnapshot', ['version', 'etag', 'businesses', 'fragments', 'industries', 'by_industry'])
+
+CatalogPage = namedtuple('CatalogPage', ['fragments', 'page', 'pages', 'total'])
+
+
+def industry_key(industry):
+	#The catalog has both "technology" and "Technology", they filter as one
+	return (industry or '').strip().lower()
+
+
+class BusinessCatalog(object):
+	def __init__(self, load, render_fragment):
+		#load returns CatalogBusiness rows in id order, render_fragment turns one into html
+		self.load = load
+		self.render_fragment = render_fragment
+		self._snapshot = None
+		self._lock = threading.Lock()
+		self.builds = 0
+
+	def snapshot(self, version):
+		current = self._snapshot
+		if current is not None and current.version == version:
+			return current
+		with self._lock:
+			if self._snapshot is None or self._snapshot.version != version:
+				self._snapshot = self._build(version)
+				self.builds += 1
+			return self._snapshot
+
+	def _build(self, version):
+		businesses = tuple(CatalogBusiness(*row) for row in self.load())
+		fragments = tuple(self.render_fragment(business) for business in businesses)
+		by_industry = {}
+		names = {}
+		for position, business in enumerate(businesses):
+			key = industry_key(business.industry)
+			by_industry.setdefault(key, []).append(position)
+			names.setdefault(key, (business.industry or '').strip())
+		industries = tuple((key, names[key]) for key in sorted(by_industry) if key)
+		etag = hashlib.sha1(repr(version).encode('utf-8')).hexdigest()[:20]
+		return CatalogSnapshot(version, etag, businesses, fragments, industries, dict((key, tuple(positions)) for key, positions in by_industry.items()))
+
+	def page(self, snapshot, industry=None, page=1, page_size=50):
+		if industry:
+			positions = snapshot.by_industry.get(industry_key(industry), ())
+		else:
+			positions = range(len(snapshot.businesses))
+		total = len(positions)
+		pages = max((total + page_size - 1) // page_size, 1)
+		page = min(max(page, 1), pages)
+		start = (page - 1) * page_size
+		return CatalogPage(tuple(snapshot.fragments[position] for position in positions[start:start + page_size]), page, pages, total)
@@ -0,0 +1,90 @@
+import time
+
+from flask import g, has_request_context, session as user_session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, exc, orm
+from sqlalchemy.sql.expression import Select
+
+#Read/write routing for the Flask-SQLAlchemy session. While a request is marked read only
+#(g.read_only) its queries go to the 'replica' bind if one is configured. A write, and anything
+#after it in the same session, always goes to the primary. The session also remembers whether it
+#wrote anything so commit on teardown can be skipped for requests that only read.
+#After a request writes, the user's reads stay on the primary for READ_YOUR_WRITES_SECONDS (a
+#timestamp in their flask session) so the page they are sent to next doesn't read a replica
+#that hasn't caught up with the write yet.
+
+REPLICA_BIND = 'replica'
+PRIMARY_UNTIL = 'primary_until'
+
+
+def pin_to_primary(app):
+	seconds = app.config.get('READ_YOUR_WRITES_SECONDS')
+	if seconds and has_request_context():
+		user_session[PRIMARY_UNTIL] = time.time() + seconds
+
+def pinned_to_primary():
+	return has_request_context() and user_session.get(PRIMARY_UNTIL, 0) > time.time()
+
+
+class RoutingSession(SignallingSession):
+	def __init__(self, db, **options):
+		SignallingSession.__init__(self, db, **options)
+		self.wrote = False
+
+	def has_writes(self):
+		return self.wrote or bool(self.new or self.dirty or self.deleted)
+
+	def uses_replica(self):
+		return bool(g.get('read_only')) and not self._flushing and REPLICA_BIND in (self.app.config['SQLALCHEMY_BINDS'] or {}) and not self.has_writes() and not pinned_to_primary()
+
+	def remember_write(self):
+		self.wrote = True
+		pin_to_primary(self.app)
+
+	def get_bind(self, mapper=None, clause=None):
+		if self.uses_replica():
+			return get_state(self.app).db.get_engine(self.app, bind=REPLICA_BIND)
+		return SignallingSession.get_bind(self, mapper, clause)
+
+	def execute(self, clause, params=None, mapper=None, bind=None, **kw):
+		#Core inserts and updates (and raw sql) don't flush, anything but a select counts as a write
+		if not isinstance(clause, Select):
+			self.remember_write()
+		return SignallingSession.execute(self, clause, params=params, mapper=mapper, bind=bind, **kw)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def remember_flush(session, flush_context):
+	session.remember_write()
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def forget_writes(session):
+	session.wrote = False
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+	def create_session(self, options):
+		return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+	def apply_driver_hacks(self, app, info, options):
+		SQLAlchemy.apply_driver_hacks(self, app, info, options)
+		#SQLite opens a connection per checkout and has no queue to size, so the pool settings
+		#meant for postgres are dropped instead of making create_engine fail
+		if info.drivername.startswith('sqlite'):
+			for option in ('pool_size', 'max_overflow', 'pool_timeout'):
+				options.pop(option, None)
+
+
+def ping_on_checkout(engine):
+	#Tries every connection as it leaves the pool. A dead one (database restarted, idle connection
+	#dropped by a proxy) is thrown away and the pool hands out a fresh one instead of the request failing.
+	def ping(dbapi_connection, connection_record, connection_proxy):
+		try:
+			cursor = dbapi_connection.cursor()
+			cursor.execute('SELECT 1')
+			cursor.close()
+		except Exception:
+			raise exc.DisconnectionError()
+
+	event.listen(engine.pool, 'checkout', ping)
@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+#Caches the handful of investor fields a request needs so the user loader doesn't
+#have to query the investors table on every @login_required page.
+#Each worker keeps a small LRU in memory and can sit in front of a shared backend
+#(redis, or LocalSharedCache as an in process stand in) that all workers read.
+
+
+class InvestorIdentity(UserMixin):
+	#Lightweight stand in for Investor used as current_user
+	FIELDS = ('id', 'username', 'email', 'profile_thumbnail_key', 'profile_thumbnail_type')
+
+	def __init__(self, id, username, email, profile_thumbnail_key=None, profile_thumbnail_type=None):
+		self.id = id
+		self.username = username
+		self.email = email
+		self.profile_thumbnail_key = profile_thumbnail_key
+		self.profile_thumbnail_type = profile_thumbnail_type
+
+	@classmethod
+	def from_row(cls, row):
+		return cls(*row)
+
+	def to_dict(self):
+		return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+
+class LocalSharedCache(object):
+	#Same interface as RedisSharedCache but inside this process, for development and tests
+	def __init__(self):
+		self._values = {}
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			value = self._values.get(key)
+			if value is None:
+				return None
+			if value[1] < time.time():
+				del self._values[key]
+				return None
+			return value[0]
+
+	def set(self, key, value, ttl):
+		with self._lock:
+			self._values[key] = (value, time.time() + ttl)
+
+	def delete(self, key):
+		with self._lock:
+			self._values.pop(key, None)
+
+
+class RedisSharedCache(object):
+	def __init__(self, url, prefix='investor-identity:'):
+		import redis
+		self._client = redis.StrictRedis.from_url(url)
+		self.prefix = prefix
+
+	def get(self, key):
+		value = self._client.get(self.prefix + str(key))
+		return None if value is None else value.decode('utf-8')
+
+	def set(self, key, value, ttl):
+		self._client.setex(self.prefix + str(key), int(ttl), value)
+
+	def delete(self, key):
+		self._client.delete(self.prefix + str(key))
+
+
+class IdentityCache(object):
+	def __init__(self, max_entries=1024, ttl=60, shared=None, shared_ttl=600):
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self.shared = shared
+		self.shared_ttl = shared_ttl
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.shared_hits = 0
+		self.misses = 0
+
+	def get(self, investor_id):
+		now = time.time()
+		with self._lock:
+			entry = self._entries.get(investor_id)
+			if entry is not None and entry[1] >= now:
+				self._entries.move_to_end(investor_id)
+				self.hits += 1
+				return entry[0]
+			if entry is not None:
+				del self._entries[investor_id]
+		if self.shared is not None:
+			value = self.shared.get(investor_id)
+			if value is not None:
+				identity = InvestorIdentity(**json.loads(value))
+				self._remember(investor_id, identity)
+				with self._lock:
+					self.shared_hits += 1
+				return identity
+		with self._lock:
+			self.misses += 1
+		return None
+
+	def set(self, investor_id, identity):
+		self._remember(investor_id, identity)
+		if self.shared is not None:
+			self.shared.set(investor_id, json.dumps(identity.to_dict()), self.shared_ttl)
+
+	def _remember(self, investor_id, identity):
+		with self._lock:
+			self._entries[investor_id] = (identity, time.time() + self.ttl)
+			self._entries.move_to_end(investor_id)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def delete(self, investor_id):
+		#Other workers drop their local copy when its ttl runs out, which is why that ttl is short
+		with self._lock:
+			self._entries.pop(investor_id, None)
+		if self.shared is not None:
+			self.shared.delete(investor_id)
+
+	def stats(self):
+		with self._lock:
+			lookups = self.hits + self.shared_hits + self.misses
+			return dict(hits=self.hits, shared_hits=self.shared_hits, misses=self.misses, size=len(self._entries), hit_rate=(self.hits + self.shared_hits) / lookups if lookups else 0.0)
@@ -0,0 +1,226 @@
+import collections
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+#Request timing for the hot paths. Code wraps its stages in span(name); the time (and for
+#SQL the query count) is collected per request for a Server-Timing header and fed into
+#Prometheus histograms that /metrics renders in the text exposition format.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+	if not names:
+		return ''
+	return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in zip(names, values)) + '}'
+
+def _format_value(value):
+	return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Histogram(object):
+	def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+		self._series = {}
+		self._lock = threading.Lock()
+
+	def observe(self, value, *labelvalues):
+		with self._lock:
+			series = self._series.get(labelvalues)
+			if series is None:
+				series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0]
+			counts = series[0]
+			for index, bound in enumerate(self.buckets):
+				if value <= bound:
+					counts[index] += 1
+			series[1] += value
+
+	def render(self):
+		lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} histogram'.format(self.name)]
+		with self._lock:
+			series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+		for labelvalues, counts, total in series:
+			for bound, count in zip(self.buckets, counts):
+				lines.append('{}_bucket{} {}'.format(self.name, _format_labels(self.labelnames + ('le',), labelvalues + (_format_value(bound),)), count))
+			lines.append('{}_sum{} {}'.format(self.name, _format_labels(self.labelnames, labelvalues), _format_value(total)))
+			lines.append('{}_count{} {}'.format(self.name, _format_labels(self.labelnames, labelvalues), counts[-1]))
+		return lines
+
+
+class Counter(object):
+	def __init__(self, name, documentation, labelnames=()):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self._values = collections.defaultdict(float)
+		self._lock = threading.Lock()
+
+	def inc(self, amount=1, *labelvalues):
+		with self._lock:
+			self._values[labelvalues] += amount
+
+	def render(self):
+		lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} counter'.format(self.name)]
+		with self._lock:
+			values = sorted(self._values.items())
+		for labelvalues, value in values:
+			lines.append('{}{} {}'.format(self.name, _format_labels(self.labelnames, labelvalues), _format_value(value)))
+		return lines
+
+
+class GaugeCallback(object):
+	#Read at scrape time, collect returns a number or a {label value: number} dict
+	def __init__(self, name, documentation, collect, labelname=None):
+		self.name = name
+		self.documentation = documentation
+		self.collect = collect
+		self.labelname = labelname
+
+	def render(self):
+		lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} gauge'.format(self.name)]
+		try:
+			values = self.collect()
+		except Exception:
+			logger.exception("Could not collect %s", self.name)
+			return lines
+		if isinstance(values, dict):
+			for labelvalue, value in sorted(values.items()):
+				if isinstance(value, (int, float)) and not isinstance(value, bool):
+					lines.append('{}{} {}'.format(self.name, _format_labels((self.labelname,), (labelvalue,)), _format_value(value)))
+		elif values is not None:
+			lines.append('{} {}'.format(self.name, _format_value(values)))
+		return lines
+
+
+class Registry(object):
+	def __init__(self):
+		self._metrics = []
+
+	def register(self, metric):
+		self._metrics.append(metric)
+		return metric
+
+	def histogram(self, *args, **kwargs):
+		return self.register(Histogram(*args, **kwargs))
+
+	def counter(self, *args, **kwargs):
+		return self.register(Counter(*args, **kwargs))
+
+	def gauge(self, *args, **kwargs):
+		return self.register(GaugeCallback(*args, **kwargs))
+
+	def render(self):
+		lines = []
+		for metric in self._metrics:
+			lines.extend(metric.render())
+		return '\n'.join(lines) + '\n'
+
+
+class RequestTimer(object):
+	#Keeps the spans of the request running on the current thread. Spans with the same name add up,
+	#and work done outside a request (background threads, commands) only reaches the histograms.
+	def __init__(self, registry):
+		self._local = threading.local()
+		self.span_seconds = registry.histogram('app_span_seconds', 'Time spent in each instrumented stage', ('span',))
+		self.queries = registry.counter('app_sql_queries_total', 'SQL statements executed')
+
+	def start_request(self):
+		self._local.spans = collections.OrderedDict()
+		self._local.sql_queries = 0
+
+	def finish_request(self):
+		spans = getattr(self._local, 'spans', None)
+		queries = getattr(self._local, 'sql_queries', 0)
+		self._local.spans = None
+		return spans or collections.OrderedDict(), queries
+
+	def add(self, name, seconds):
+		self.span_seconds.observe(seconds, name)
+		spans = getattr(self._local, 'spans', None)
+		if spans is not None:
+			spans[name] = spans.get(name, 0.0) + seconds
+
+	@contextmanager
+	def span(self, name):
+		start = time.time()
+		try:
+			yield
+		finally:
+			self.add(name, time.time() - start)
+
+	def watch_engine(self, engine, event):
+		#event is sqlalchemy.event, passed in so this module doesn't need sqlalchemy itself
+		#The start time rides on the statement's execution context, which goes away with the statement
+		#whether or not it succeeds. after_cursor_execute never fires for a statement that raised
+		def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+			context._instrumentation_started = time.time()
+
+		def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+			started = getattr(context, '_instrumentation_started', None)
+			if started is None:
+				return
+			self.queries.inc()
+			if getattr(self._local, 'spans', None) is not None:
+				self._local.sql_queries += 1
+			self.add('sql', time.time() - started)
+
+		event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+		event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def server_timing(spans, sql_queries, total=None):
+	#Server-Timing header value, durations in milliseconds
+	entries = []
+	for name, seconds in spans.items():
+		if name == 'sql':
+			entries.append('sql;dur={:.2f};desc="{} queries"'.format(seconds * 1e3, sql_queries))
+		else:
+			entries.append('{};dur={:.2f}'.format(name, seconds * 1e3))
+	if total is not None:
+		entries.append('total;dur={:.2f}'.format(total * 1e3))
+	return ', '.join(entries)
+
+
+class SamplingProfiler(object):
+	#Samples one thread's stack every interval seconds from a helper thread.
+	#The result is in collapsed stack format ("outer;inner;leaf count" per line), ready for flamegraph tools.
+	def __init__(self, thread_id=None, interval=0.005):
+		self.thread_id = thread_id or threading.get_ident()
+		self.interval = interval
+		self.samples = collections.Counter()
+		self._stop = threading.Event()
+		self._thread = None
+
+	def start(self):
+		self._thread = threading.Thread(target=self._run, name='sampling-profiler')
+		self._thread.daemon = True
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join()
+		return self
+
+	def _run(self):
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self.thread_id)
+			stack = []
+			while frame is not None:
+				code = frame.f_code
+				stack.append('{} ({}:{})'.format(code.co_name, code.co_filename, code.co_firstlineno))
+				frame = frame.f_back
+			if stack:
+				self.samples[';'.join(reversed(stack))] += 1
+
+	def collapsed(self):
+		return '\n'.join('{} {}'.format(stack, count) for stack, count in self.samples.most_common())
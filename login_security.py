@@ -0,0 +1,122 @@
+import collections
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+#Password hashing is slow on purpose. Doing it on the request thread holds the GIL for the whole
+#hash, so a burst of logins stalls every other request in the worker. PasswordHasher runs it in a
+#small process pool instead, and LoginThrottle stops retry storms before they reach the pool.
+
+
+class HashingBusy(Exception):
+	#More hashes are waiting than the pool is allowed to queue, or one took longer than the timeout
+	pass
+
+
+def _stored_method(pwhash):
+	return (pwhash or '').split('$', 1)[0]
+
+
+class PasswordHasher(object):
+	def __init__(self, method='pbkdf2:sha256:150000', workers=2, max_pending=None, timeout=10):
+		#workers=0 hashes on the calling thread, handy for commands and tests
+		self.method = method
+		self.workers = workers
+		self.timeout = timeout
+		self._slots = threading.BoundedSemaphore(max_pending or max(workers, 1) * 4)
+		self._executor = None
+		self._pid = None
+		self._lock = threading.Lock()
+
+	def _pool(self):
+		#Started on first use and again after a fork, a pool inherited from the parent is useless
+		with self._lock:
+			if self._executor is None or self._pid != os.getpid():
+				self._executor = ProcessPoolExecutor(max_workers=self.workers)
+				self._pid = os.getpid()
+			return self._executor
+
+	def _run(self, function, *args):
+		if not self.workers:
+			return function(*args)
+		#One deadline covers waiting for a slot and waiting for the hash
+		deadline = time.time() + self.timeout
+		if not self._slots.acquire(timeout=self.timeout):
+			raise HashingBusy("too many passwords waiting to be hashed")
+		try:
+			future = self._pool().submit(function, *args)
+		except Exception:
+			self._slots.release()
+			raise
+		#The slot is only given back once the hash is done, a caller that gave up waiting
+		#still counts against the queue until the pool has actually finished its work
+		future.add_done_callback(lambda future: self._slots.release())
+		try:
+			return future.result(max(deadline - time.time(), 0))
+		except TimeoutError:
+			raise HashingBusy("hashing a password took longer than {}s".format(self.timeout))
+
+	def hash(self, password):
+		return self._run(generate_password_hash, password, self.method)
+
+	def verify(self, pwhash, password):
+		if not pwhash:
+			return False
+		return self._run(check_password_hash, pwhash, password)
+
+	def needs_rehash(self, pwhash):
+		#True when the hash was made with other parameters than the configured ones, e.g. fewer iterations.
+		#A method without an iteration count matches any count.
+		stored = _stored_method(pwhash)
+		return stored != self.method and not stored.startswith(self.method + ':')
+
+
+class LoginThrottle(object):
+	#Counts failed logins per key (an account or an address) over a sliding window.
+	#Keys are kept in the order they last failed, so every write drops the keys whose window has
+	#passed from the front, and past max_keys the least recently failed keys are forgotten
+	def __init__(self, window=300, max_keys=100000):
+		self.window = window
+		self.max_keys = max_keys
+		self._failures = collections.OrderedDict()
+		self._lock = threading.Lock()
+
+	def _prune(self, key, now):
+		failures = self._failures.get(key)
+		while failures and failures[0] <= now - self.window:
+			failures.popleft()
+		if failures is not None and not failures:
+			del self._failures[key]
+
+	def failures(self, key):
+		now = time.time()
+		with self._lock:
+			self._prune(key, now)
+			return len(self._failures.get(key, ()))
+
+	def is_blocked(self, limits):
+		#limits is {key: allowed failures}, blocked once any key has used them up
+		return any(self.failures(key) >= allowed for key, allowed in limits.items())
+
+	def record_failure(self, keys):
+		now = time.time()
+		with self._lock:
+			for key in keys:
+				failures = self._failures.pop(key, None) or collections.deque()
+				failures.append(now)
+				self._failures[key] = failures
+			while self._failures:
+				key, failures = next(iter(self._failures.items()))
+				if failures[-1] > now - self.window and len(self._failures) <= self.max_keys:
+					break
+				del self._failures[key]
+
+	def __len__(self):
+		return len(self._failures)
+
+	def reset(self, key):
+		with self._lock:
+			self._failures.pop(key, None)
@@ -0,0 +1,139 @@
+import logging
+import smtplib
+import threading
+import time
+from queue import Queue, Empty, Full
+
+logger = logging.getLogger(__name__)
+
+#Outbound mail goes through one bounded queue instead of a thread per message.
+#A small pool of workers takes up to batch_size jobs at a time, renders them and
+#sends the whole batch over a single SMTP connection, so a burst of feedback costs
+#one TLS handshake per batch instead of one per message.
+
+#Errors where the message itself is the problem, trying again won't help
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+#Connection level errors, the batch is retried on a fresh connection
+TRANSIENT_ERRORS = (smtplib.SMTPException, OSError)
+
+
+class MailQueue(object):
+	def __init__(self, render, connect, context=None, max_size=1000, workers=1, batch_size=20, batch_wait=1.0, retries=3, backoff=2.0):
+		#render turns a queued job into a message, connect opens a connection with a send(message) method
+		#used as a context manager, context (optional) is entered around every batch, e.g. app.app_context
+		self.render = render
+		self.connect = connect
+		self.context = context
+		self.workers = workers
+		self.batch_size = batch_size
+		self.batch_wait = batch_wait
+		self.retries = retries
+		self.backoff = backoff
+		self._queue = Queue(max_size)
+		self._threads = []
+		self._lock = threading.Lock()
+		self._counts = dict(enqueued=0, sent=0, failed=0, retried=0, dropped=0, batches=0, connections=0)
+
+	def _count(self, name, amount=1):
+		with self._lock:
+			self._counts[name] += amount
+
+	def _start(self):
+		#Workers start with the first message so importing the app (or forking it) never spawns threads
+		with self._lock:
+			if self._threads:
+				return
+			for number in range(self.workers):
+				thread = threading.Thread(target=self._run, name='mail-queue-{}'.format(number))
+				thread.daemon = True
+				thread.start()
+				self._threads.append(thread)
+
+	def enqueue(self, job):
+		#Never blocks the request: when the queue is full the message is dropped and counted
+		self._start()
+		try:
+			self._queue.put_nowait(job)
+		except Full:
+			self._count('dropped')
+			logger.warning("Mail queue is full, dropping message")
+			return False
+		self._count('enqueued')
+		return True
+
+	def flush(self, timeout=None):
+		#Waits until everything queued so far has been sent or given up on
+		end = None if timeout is None else time.time() + timeout
+		while self._queue.unfinished_tasks:
+			if end is not None and time.time() >= end:
+				return False
+			time.sleep(0.05)
+		return True
+
+	def stats(self):
+		with self._lock:
+			stats = dict(self._counts)
+		stats['queued'] = self._queue.qsize()
+		return stats
+
+	def _next_batch(self):
+		jobs = [self._queue.get()]
+		deadline = time.time() + self.batch_wait
+		while len(jobs) < self.batch_size:
+			remaining = deadline - time.time()
+			if remaining <= 0:
+				break
+			try:
+				jobs.append(self._queue.get(timeout=remaining))
+			except Empty:
+				break
+		return jobs
+
+	def _run(self):
+		while True:
+			jobs = self._next_batch()
+			try:
+				if self.context is not None:
+					with self.context():
+						self._deliver(jobs)
+				else:
+					self._deliver(jobs)
+			except Exception:
+				logger.exception("Mail batch failed")
+			finally:
+				for _ in jobs:
+					self._queue.task_done()
+
+	def _deliver(self, jobs):
+		messages = []
+		for job in jobs:
+			try:
+				messages.append(self.render(job))
+			except Exception:
+				self._count('failed')
+				logger.exception("Could not render queued mail")
+		self._count('batches')
+		attempt = 0
+		while messages:
+			try:
+				self._count('connections')
+				with self.connect() as connection:
+					while messages:
+						try:
+							connection.send(messages[0])
+						except PERMANENT_ERRORS as e:
+							self._count('failed')
+							logger.warning("Mail server refused a message: %s", e)
+						else:
+							self._count('sent')
+						messages.pop(0)
+			except TRANSIENT_ERRORS as e:
+				if attempt >= self.retries:
+					self._count('failed', len(messages))
+					logger.error("Giving up on %d messages after %d retries: %s", len(messages), attempt, e)
+					return
+				delay = self.backoff * (2 ** attempt)
+				attempt += 1
+				self._count('retried')
+				logger.warning("Mail delivery failed (%s), retrying %d messages in %.1fs", e, len(messages), delay)
+				time.sleep(delay)
@@ -0,0 +1,227 @@
+import datetime
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from array import array
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+QUANDL_BASE_URL = "https://www.quandl.com/api/v3/datasets/WIKI/{}.json"
+#Column 4 of a WIKI dataset is the close, asking for it alone keeps responses tiny
+QUANDL_CLOSE_COLUMN = 4
+
+#Compact form of a dataset, most recent first: dates as iso strings and closes as a typed array
+PriceRecord = namedtuple('PriceRecord', ['dates', 'closes'])
+
+# One pooled session is shared by every fetch so connections to Quandl get reused
+_session = None
+_session_lock = threading.Lock()
+
+# Caps the number of in flight calls per host no matter how big the thread pool is
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+# When a host tells us to slow down every thread waits out the cooldown, not just the one that got the 429
+_host_cooldowns = {}
+_host_cooldowns_lock = threading.Lock()
+
+
+def get_http_session(pool_size=10):
+	#requests is imported with the first quandl call, the replay and synthetic providers never need it
+	global _session
+	with _session_lock:
+		if _session is None:
+			import requests
+			from requests.adapters import HTTPAdapter
+			session = requests.Session()
+			adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+			session.mount('http://', adapter)
+			session.mount('https://', adapter)
+			_session = session
+		return _session
+
+
+def _host_semaphore(url, max_per_host):
+	host = urlparse(url).netloc
+	with _host_semaphores_lock:
+		if host not in _host_semaphores:
+			_host_semaphores[host] = threading.BoundedSemaphore(max_per_host)
+		return _host_semaphores[host]
+
+
+def _wait_for_cooldown(host):
+	with _host_cooldowns_lock:
+		until = _host_cooldowns.get(host, 0)
+	delay = until - time.time()
+	if delay > 0:
+		time.sleep(delay)
+
+def _start_cooldown(host, seconds):
+	with _host_cooldowns_lock:
+		_host_cooldowns[host] = max(_host_cooldowns.get(host, 0), time.time() + seconds)
+
+def _retry_after(response, default):
+	try:
+		return max(float(response.headers.get('Retry-After')), 0)
+	except (TypeError, ValueError):
+		return default
+
+
+def project_closes(quandl_data, rows=None):
+	#Keeps only the date and close of the newest rows, whether or not the api already trimmed the columns
+	dataset = quandl_data["dataset"]
+	column_names = dataset.get("column_names") or []
+	close_index = column_names.index("Close") if "Close" in column_names else QUANDL_CLOSE_COLUMN
+	data = dataset["data"][:rows] if rows else dataset["data"]
+	return PriceRecord(tuple(row[0] for row in data), array('d', (float(row[close_index]) for row in data)))
+
+
+def fetch_quandl_data(searchterm, base_url=QUANDL_BASE_URL, api_key=None, timeout=10, max_per_host=4, rows=30, retries=0, backoff=1.0, session=None):
+	#Returns a PriceRecord, "nope" when quandl doesn't know the ticker,
+	#or None when the call itself failed (timeout, connection error, bad payload, rate limited).
+	#Rate limits and server errors are retried with exponential backoff when retries > 0.
+	import requests
+	url = base_url.format(searchterm)
+	host = urlparse(url).netloc
+	param_d = {"rows": rows, "column_index": QUANDL_CLOSE_COLUMN}
+	if api_key:
+		param_d["api_key"] = api_key
+	session = session or get_http_session()
+	for attempt in range(retries + 1):
+		delay = backoff * (2 ** attempt) * (1 + random.random() / 2)
+		try:
+			_wait_for_cooldown(host)
+			with _host_semaphore(url, max_per_host):
+				quandl_response = session.get(url, params=param_d, timeout=timeout)
+			if quandl_response.status_code == 429:
+				delay = _retry_after(quandl_response, delay)
+				_start_cooldown(host, delay)
+				logger.warning("Quandl rate limited %s, backing off %.1fs", searchterm, delay)
+			elif quandl_response.status_code >= 500:
+				logger.warning("Quandl returned %s for %s", quandl_response.status_code, searchterm)
+			else:
+				quandl_data = json.loads(quandl_response.text)
+				if "quandl_error" in quandl_data.keys():
+					return "nope"
+				return project_closes(quandl_data, rows)
+		except (requests.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+			logger.warning("Quandl request for %s failed: %s", searchterm, e)
+		if attempt < retries:
+			time.sleep(delay)
+	return None
+
+
+def fetch_many(tickers, base_url=QUANDL_BASE_URL, api_key=None, timeout=10, max_workers=8, max_per_host=4, rows=30, retries=0, backoff=1.0):
+	#Fetches every ticker at the same time so the total wait is roughly the slowest single call
+	tickers = list(dict.fromkeys(tickers))
+	if not tickers:
+		return {}
+	session = get_http_session(max(max_workers, max_per_host))
+	workers = min(max_workers, len(tickers))
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		futures = dict((ticker, pool.submit(fetch_quandl_data, ticker, base_url, api_key, timeout, max_per_host, rows, retries, backoff, session)) for ticker in tickers)
+		return dict((ticker, future.result()) for ticker, future in futures.items())
+
+
+#Market data providers. Every provider has get_closes(tickers, n, retries=0) which returns
+#{ticker: PriceRecord with the newest n closes, "nope" for an unknown ticker, or None when the call failed}.
+
+class QuandlProvider(object):
+	name = 'quandl'
+
+	def __init__(self, base_url=QUANDL_BASE_URL, api_key=None, timeout=10, max_workers=8, max_per_host=4, backoff=1.0):
+		self.base_url = base_url
+		self.api_key = api_key
+		self.timeout = timeout
+		self.max_workers = max_workers
+		self.max_per_host = max_per_host
+		self.backoff = backoff
+
+	def get_closes(self, tickers, n, retries=0):
+		return fetch_many(tickers, self.base_url, self.api_key, self.timeout, self.max_workers, self.max_per_host, n, retries, self.backoff)
+
+
+def _quandl_payload(ticker, record):
+	#The same shape quandl sends back when only the close column is asked for
+	return {"dataset": {"dataset_code": ticker, "column_names": ["Date", "Close"], "data": [[date, close] for date, close in zip(record.dates, record.closes)]}}
+
+
+class ReplayProvider(object):
+	#Serves recorded quandl responses from a directory, one <TICKER>.json each.
+	#A ticker without a file is treated as one quandl doesn't know. latency is added once per batch.
+	name = 'replay'
+
+	def __init__(self, directory, latency=0.0):
+		self.directory = directory
+		self.latency = latency
+
+	def path(self, ticker):
+		return os.path.join(self.directory, "{}.json".format(ticker))
+
+	def get_closes(self, tickers, n, retries=0):
+		if self.latency:
+			time.sleep(self.latency)
+		closes = {}
+		for ticker in dict.fromkeys(tickers):
+			path = self.path(ticker)
+			if not os.path.exists(path):
+				closes[ticker] = "nope"
+				continue
+			try:
+				with open(path) as recorded:
+					quandl_data = json.load(recorded)
+				closes[ticker] = "nope" if "quandl_error" in quandl_data else project_closes(quandl_data, n)
+			except (IOError, ValueError, KeyError, IndexError, TypeError) as e:
+				logger.warning("Recorded response for %s can't be used: %s", ticker, e)
+				closes[ticker] = None
+		return closes
+
+	def record(self, ticker, record):
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+		handle, temporary = tempfile.mkstemp(dir=self.directory)
+		with os.fdopen(handle, 'w') as out:
+			json.dump(_quandl_payload(ticker, record), out)
+		os.replace(temporary, self.path(ticker))
+
+
+class SyntheticProvider(object):
+	#Made up daily closes, a random walk that is the same every time for a given seed and ticker.
+	#Tickers listed in unknown come back as "nope". latency is added once per batch.
+	name = 'synthetic'
+
+	def __init__(self, seed=0, latency=0.0, unknown=(), newest=datetime.date(2018, 3, 27)):
+		self.seed = seed
+		self.latency = latency
+		self.unknown = frozenset(unknown)
+		self.newest = newest
+
+	def trading_days(self, n):
+		days = []
+		day = self.newest
+		while len(days) < n:
+			if day.weekday() < 5:
+				days.append(day.isoformat())
+			day -= datetime.timedelta(days=1)
+		return tuple(days)
+
+	def series(self, ticker, n):
+		rnd = random.Random("{}:{}".format(self.seed, ticker))
+		price = rnd.uniform(20, 400)
+		closes = array('d')
+		for _ in range(n):
+			closes.append(round(price, 2))
+			price = max(price * (1 + rnd.gauss(0, 0.02)), 1.0)
+		return PriceRecord(self.trading_days(n), closes)
+
+	def get_closes(self, tickers, n, retries=0):
+		if self.latency:
+			time.sleep(self.latency)
+		return dict((ticker, "nope" if ticker in self.unknown else self.series(ticker, n)) for ticker in dict.fromkeys(tickers))
@@ -0,0 +1,103 @@
+"""add suggestion_items and backfill them from suggestion_content
+
+Revision ID: 3f1c2a9d7b40
+Revises: 
+Create Date: 2026-10-17 09:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+suggestions = sa.table('suggestions',
+    sa.column('id', sa.Integer),
+    sa.column('suggestion_content', sa.Text))
+businesses = sa.table('businesses',
+    sa.column('id', sa.Integer),
+    sa.column('company_name', sa.Text),
+    sa.column('link_to_comp_info', sa.Text))
+suggestion_items = sa.table('suggestion_items',
+    sa.column('suggestion_id', sa.Integer),
+    sa.column('business_id', sa.Integer),
+    sa.column('position', sa.Integer),
+    sa.column('shares', sa.Integer),
+    sa.column('price', sa.Integer))
+
+
+def parse_suggestion_content(text):
+    # The old format is "company|numb|price|industry|link," repeated. Splitting on ","
+    # first breaks on names like "Wal-Mart Stores, Inc." so split on "|" instead; every
+    # fifth field is then "link,next company" and only that one gets split on its first ",".
+    fields = (text or '').split('|')
+    items = []
+    company = fields[0]
+    index = 1
+    while index + 3 < len(fields):
+        shares, price, industry, tail = fields[index:index + 4]
+        link, _, next_company = tail.partition(',')
+        items.append((company, shares, price, industry, link))
+        company = next_company
+        index += 4
+    return items
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # db.create_all() may already have made the table on a running app
+    if 'suggestion_items' not in sa.inspect(bind).get_table_names():
+        op.create_table('suggestion_items',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('suggestion_id', sa.Integer(), nullable=False),
+            sa.Column('business_id', sa.Integer(), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('shares', sa.Integer(), nullable=False),
+            sa.Column('price', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+            sa.ForeignKeyConstraint(['suggestion_id'], ['suggestions.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_suggestion_items_business_id', 'suggestion_items', ['business_id'], unique=False)
+        op.create_index('ix_suggestion_items_suggestion_position', 'suggestion_items', ['suggestion_id', 'position'], unique=False)
+
+    by_name = {}
+    for business_id, company_name, link in bind.execute(sa.select([businesses.c.id, businesses.c.company_name, businesses.c.link_to_comp_info])):
+        by_name.setdefault(company_name, business_id)
+        by_name[(company_name, link)] = business_id
+    already_done = set(row[0] for row in bind.execute(sa.select([suggestion_items.c.suggestion_id]).distinct()))
+
+    rows = []
+    skipped = 0
+    for suggestion_id, content in bind.execute(sa.select([suggestions.c.id, suggestions.c.suggestion_content])):
+        if suggestion_id in already_done or not content:
+            continue
+        for position, (company, shares, price, industry, link) in enumerate(parse_suggestion_content(content)):
+            business_id = by_name.get((company, link), by_name.get(company))
+            shares, price = _to_int(shares), _to_int(price)
+            if business_id is None or shares is None or price is None:
+                skipped += 1
+                continue
+            rows.append(dict(suggestion_id=suggestion_id, business_id=business_id, position=position, shares=shares, price=price))
+    if rows:
+        op.bulk_insert(suggestion_items, rows)
+    if skipped:
+        print("Skipped {} suggestion line items that didn't match a business".format(skipped))
+
+
+def downgrade():
+    op.drop_index('ix_suggestion_items_suggestion_position', table_name='suggestion_items')
+    op.drop_index('ix_suggestion_items_business_id', table_name='suggestion_items')
+    op.drop_table('suggestion_items')
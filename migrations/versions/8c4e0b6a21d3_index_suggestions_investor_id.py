@@ -0,0 +1,26 @@
+"""index suggestions.investor_id for paginated history
+
+Revision ID: 8c4e0b6a21d3
+Revises: 3f1c2a9d7b40
+Create Date: 2026-10-17 10:02:17.540931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e0b6a21d3'
+down_revision = '3f1c2a9d7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = [index['name'] for index in sa.inspect(op.get_bind()).get_indexes('suggestions')]
+    if 'ix_suggestions_investor_id' not in existing:
+        op.create_index('ix_suggestions_investor_id', 'suggestions', ['investor_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_suggestions_investor_id', table_name='suggestions')
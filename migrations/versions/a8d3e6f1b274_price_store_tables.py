@@ -0,0 +1,42 @@
+"""price store tables in the app database
+
+Revision ID: a8d3e6f1b274
+Revises: f4a6c2e8d915
+Create Date: 2026-10-17 21:02:44.530129
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3e6f1b274'
+down_revision = 'f4a6c2e8d915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Prices used to sit in a sqlite file next to each process, nothing in it needs carrying over:
+    # the refresh_prices worker (or the first suggestion request) fills these again
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'price_closes' not in tables:
+        op.create_table('price_closes',
+            sa.Column('ticker', sa.Text(), nullable=False),
+            sa.Column('dates', sa.Text(), nullable=False),
+            sa.Column('closes', sa.LargeBinary(), nullable=False),
+            sa.Column('fetched_at', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('ticker')
+        )
+    if 'price_meta' not in tables:
+        price_meta = op.create_table('price_meta',
+            sa.Column('key', sa.String(length=32), nullable=False),
+            sa.Column('value', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('key')
+        )
+        op.bulk_insert(price_meta, [dict(key='version', value=0)])
+
+
+def downgrade():
+    op.drop_table('price_meta')
+    op.drop_table('price_closes')
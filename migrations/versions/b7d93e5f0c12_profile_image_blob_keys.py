@@ -0,0 +1,33 @@
+"""keep profile images in the blob store, only their keys on investors
+
+Revision ID: b7d93e5f0c12
+Revises: 8c4e0b6a21d3
+Create Date: 2026-10-17 10:48:03.992614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d93e5f0c12'
+down_revision = '8c4e0b6a21d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('investors')]
+    # The old profile_image column stays until every investor has been moved over on first view
+    if 'profile_image_key' not in existing:
+        op.add_column('investors', sa.Column('profile_image_key', sa.String(length=64), nullable=True))
+    if 'profile_thumbnail_key' not in existing:
+        op.add_column('investors', sa.Column('profile_thumbnail_key', sa.String(length=64), nullable=True))
+    if 'profile_thumbnail_type' not in existing:
+        op.add_column('investors', sa.Column('profile_thumbnail_type', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    op.drop_column('investors', 'profile_thumbnail_type')
+    op.drop_column('investors', 'profile_thumbnail_key')
+    op.drop_column('investors', 'profile_image_key')
@@ -0,0 +1,30 @@
+"""remember tickers the price provider missed
+
+Revision ID: c6f2d9a4e813
+Revises: a8d3e6f1b274
+Create Date: 2026-10-17 23:14:08.266431
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f2d9a4e813'
+down_revision = 'a8d3e6f1b274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'price_misses' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('price_misses',
+            sa.Column('ticker', sa.Text(), nullable=False),
+            sa.Column('unknown', sa.Boolean(), nullable=False),
+            sa.Column('failed_at', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('ticker')
+        )
+
+
+def downgrade():
+    op.drop_table('price_misses')
@@ -0,0 +1,37 @@
+"""unique index on businesses.ticker_symbol
+
+Revision ID: d2a5f8c91e77
+Revises: b7d93e5f0c12
+Create Date: 2026-10-17 11:26:40.118372
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a5f8c91e77'
+down_revision = 'b7d93e5f0c12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Older versions could add the same ticker twice, fold every duplicate into the oldest row first
+    duplicates = bind.execute(sa.text(
+        "SELECT b.id, keeper.id FROM businesses b "
+        "JOIN (SELECT ticker_symbol, MIN(id) AS id FROM businesses GROUP BY ticker_symbol) keeper "
+        "ON b.ticker_symbol = keeper.ticker_symbol AND b.id <> keeper.id")).fetchall()
+    for duplicate_id, keeper_id in duplicates:
+        params = dict(duplicate_id=duplicate_id, keeper_id=keeper_id)
+        bind.execute(sa.text("UPDATE reference_guide SET business_id = :keeper_id WHERE business_id = :duplicate_id"), **params)
+        bind.execute(sa.text("UPDATE suggestion_items SET business_id = :keeper_id WHERE business_id = :duplicate_id"), **params)
+        bind.execute(sa.text("DELETE FROM businesses WHERE id = :duplicate_id"), **params)
+    existing = [index['name'] for index in sa.inspect(bind).get_indexes('businesses')]
+    if 'ix_businesses_ticker_symbol' not in existing:
+        op.create_index('ix_businesses_ticker_symbol', 'businesses', ['ticker_symbol'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_businesses_ticker_symbol', table_name='businesses')
@@ -0,0 +1,31 @@
+"""profile picture blobs in the app database
+
+Revision ID: d9e4b1a7c356
+Revises: c6f2d9a4e813
+Create Date: 2026-10-17 23:41:52.907318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9e4b1a7c356'
+down_revision = 'c6f2d9a4e813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Pictures already written to PROFILE_IMAGE_DIR are copied in with python Final_Project.py store_profile_images
+    if 'profile_blobs' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('profile_blobs',
+            sa.Column('key', sa.String(length=64), nullable=False),
+            sa.Column('data', sa.LargeBinary(), nullable=False),
+            sa.Column('created_at', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('key')
+        )
+
+
+def downgrade():
+    op.drop_table('profile_blobs')
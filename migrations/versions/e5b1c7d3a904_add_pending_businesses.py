@@ -0,0 +1,42 @@
+"""pending_businesses for feedback submissions awaiting ticker validation
+
+Revision ID: e5b1c7d3a904
+Revises: d2a5f8c91e77
+Create Date: 2026-10-17 12:04:51.602734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1c7d3a904'
+down_revision = 'd2a5f8c91e77'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have made the table on a running app
+    if 'pending_businesses' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('pending_businesses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('investor_id', sa.Integer(), nullable=True),
+        sa.Column('company_name', sa.Text(), nullable=True),
+        sa.Column('ticker_symbol', sa.Text(), nullable=False),
+        sa.Column('industry', sa.Text(), nullable=True),
+        sa.Column('link_to_comp_info', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True),
+        sa.Column('checked_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['investor_id'], ['investors.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_pending_businesses_status_id', 'pending_businesses', ['status', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_pending_businesses_status_id', table_name='pending_businesses')
+    op.drop_table('pending_businesses')
@@ -0,0 +1,27 @@
+"""created_at on suggestions for backtesting
+
+Revision ID: f4a6c2e8d915
+Revises: e5b1c7d3a904
+Create Date: 2026-10-17 14:21:07.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a6c2e8d915'
+down_revision = 'e5b1c7d3a904'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing suggestions keep a null created_at, nothing records when they were made
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('suggestions')]
+    if 'created_at' not in columns:
+        op.add_column('suggestions', sa.Column('created_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('suggestions', 'created_at')
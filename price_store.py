@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import Table, Column, String, Text, LargeBinary, Float, Integer, Boolean, select, exc
+from sqlalchemy.dialects import postgresql
+
+from market_data import PriceRecord
+
+logger = logging.getLogger(__name__)
+
+#Keyed store for quandl price data, one row per ticker. It lives in the app's own database so the
+#web workers and the refresh_prices worker, which run as separate processes (and separate dynos
+#under the Procfile), all read and write the same prices.
+#Each put merges the new closes into the history already stored for its tickers, in one transaction
+#that also bumps the snapshot version when any ticker's closes actually changed. A refetch that brings
+#nothing new only moves fetched_at, so rankings cached under the snapshot stay valid.
+#Refreshes only fetch the most recent closes but the history builds up from them, up to history_days
+#closes per ticker, so backtests can look back further than one refresh brings in.
+#Closes are kept as packed doubles so reading a ticker never goes through a json parser.
+#Tickers the provider didn't know ("nope") or didn't answer for (None) are remembered in price_misses
+#for a while, so they aren't asked for again on every request.
+
+
+def price_tables(metadata):
+	#The store's tables, on metadata so create_all and the migrations look after them with everything else
+	closes = Table('price_closes', metadata,
+		Column('ticker', Text, primary_key=True),
+		Column('dates', Text, nullable=False),
+		Column('closes', LargeBinary, nullable=False),
+		Column('fetched_at', Float, nullable=False))
+	meta = Table('price_meta', metadata,
+		Column('key', String(32), primary_key=True),
+		Column('value', Integer, nullable=False))
+	misses = Table('price_misses', metadata,
+		Column('ticker', Text, primary_key=True),
+		Column('unknown', Boolean, nullable=False),
+		Column('failed_at', Float, nullable=False))
+	return closes, meta, misses
+
+def _encode(record):
+	return (",".join(record.dates), record.closes.tobytes())
+
+def _decode(dates, closes):
+	values = array('d')
+	values.frombytes(bytes(closes))
+	return PriceRecord(tuple(dates.split(",")) if dates else (), values)
+
+def merge_history(record, stored, max_days=None):
+	#Every day either one has, once and newest first, the new record wins for the days both have.
+	#Only the newest max_days are kept
+	closes = dict(zip(stored.dates, stored.closes)) if stored is not None else {}
+	closes.update(zip(record.dates, record.closes))
+	days = sorted(closes, reverse=True)[:max_days]
+	return PriceRecord(tuple(days), array('d', [closes[day] for day in days]))
+
+
+class PriceStore(object):
+	def __init__(self, engine, tables, unknown_ttl=24*60*60, failure_ttl=10*60, history_days=None):
+		#A ticker the provider doesn't know is left alone for unknown_ttl seconds, one it failed to answer for failure_ttl.
+		#history_days caps the closes kept per ticker, None keeps them all
+		self.engine = engine
+		self.closes, self.meta, self.misses = tables
+		self.history_days = history_days
+		self.unknown_ttl = unknown_ttl
+		self.failure_ttl = failure_ttl
+		self._schema_ready = False
+		self._schema_lock = threading.Lock()
+
+	def _connect(self):
+		if not self._schema_ready:
+			with self._schema_lock:
+				if not self._schema_ready:
+					#Already there when the schema came from create_all or the migrations
+					self.closes.metadata.create_all(self.engine, tables=[self.closes, self.meta, self.misses])
+					try:
+						with self.engine.begin() as conn:
+							if conn.execute(select([self.meta.c.value]).where(self.meta.c.key == 'version')).first() is None:
+								conn.execute(self.meta.insert().values(key='version', value=0))
+					except exc.IntegrityError:
+						#Another process added it first
+						pass
+					self._schema_ready = True
+		return self.engine
+
+	def get(self, ticker):
+		return self.get_many([ticker]).get(ticker)
+
+	def get_many(self, tickers):
+		return dict((ticker, entry[0]) for ticker, entry in self.get_entries(tickers).items())
+
+	def get_entries(self, tickers):
+		#Same as get_many but each value is a (record, fetched_at) pair so callers can judge freshness
+		tickers = list(dict.fromkeys(tickers))
+		found = {}
+		engine = self._connect()
+		columns = self.closes.c
+		#Stay under the bound parameter limit of every database
+		for start in range(0, len(tickers), 500):
+			chunk = tickers[start:start + 500]
+			for ticker, dates, closes, fetched_at in engine.execute(select([columns.ticker, columns.dates, columns.closes, columns.fetched_at]).where(columns.ticker.in_(chunk))):
+				found[ticker] = (_decode(dates, closes), fetched_at)
+		return found
+
+	def fetched_at(self, tickers):
+		#{ticker: when it was last fetched}, without reading the closes themselves
+		tickers = list(dict.fromkeys(tickers))
+		found = {}
+		engine = self._connect()
+		columns = self.closes.c
+		for start in range(0, len(tickers), 500):
+			found.update(engine.execute(select([columns.ticker, columns.fetched_at]).where(columns.ticker.in_(tickers[start:start + 500]))).fetchall())
+		return found
+
+	def put(self, ticker, record):
+		self.put_many({ticker: record})
+
+	def put_many(self, records):
+		#Returns the tickers whose closes changed
+		if not records:
+			return []
+		now = time.time()
+		changed = []
+		with self._connect().begin() as conn:
+			stored = self._locked_entries(conn, list(records))
+			rows = []
+			for ticker, record in records.items():
+				merged = merge_history(record, stored.get(ticker), self.history_days)
+				if ticker not in stored or merged != stored[ticker]:
+					changed.append(ticker)
+				rows.append(dict(zip(('ticker', 'dates', 'closes', 'fetched_at'), (ticker,) + _encode(merged) + (now,))))
+			self._upsert(conn, self.closes, rows)
+			conn.execute(self.misses.delete().where(self.misses.c.ticker.in_(list(records))))
+			if changed:
+				#New closes publish a new snapshot, anything computed from the old one is out of date
+				conn.execute(self.meta.update().where(self.meta.c.key == 'version').values(value=self.meta.c.value + 1))
+		return changed
+
+	def put_fetched(self, fetched):
+		#Takes a provider's answer, {ticker: PriceRecord, "nope" or None}: stores the prices and
+		#remembers the misses. Returns just the prices
+		records = dict((ticker, record) for ticker, record in fetched.items() if record is not None and record != "nope")
+		self.put_many(records)
+		self.put_misses(dict((ticker, record == "nope") for ticker, record in fetched.items() if ticker not in records))
+		return records
+
+	def put_misses(self, misses):
+		#misses is {ticker: True when the provider doesn't know it, False when it just didn't answer}.
+		#Doesn't publish a new snapshot, nothing computed from the current one changes
+		if not misses:
+			return
+		now = time.time()
+		with self._connect().begin() as conn:
+			self._upsert(conn, self.misses, [dict(ticker=ticker, unknown=unknown, failed_at=now) for ticker, unknown in misses.items()])
+
+	def get_misses(self, tickers):
+		#{ticker: True while its miss is recent enough to skip it, False once it is due another try},
+		#tickers that never missed aren't in it
+		tickers = list(dict.fromkeys(tickers))
+		found = {}
+		now = time.time()
+		engine = self._connect()
+		columns = self.misses.c
+		for start in range(0, len(tickers), 500):
+			for ticker, unknown, failed_at in engine.execute(select([columns.ticker, columns.unknown, columns.failed_at]).where(columns.ticker.in_(tickers[start:start + 500]))):
+				found[ticker] = now - failed_at < (self.unknown_ttl if unknown else self.failure_ttl)
+		return found
+
+	def _locked_entries(self, conn, tickers):
+		#The stored history of tickers, locked until the transaction ends on databases that lock rows
+		#so two writers can't both merge into the same old history
+		stored = {}
+		columns = self.closes.c
+		for start in range(0, len(tickers), 500):
+			query = select([columns.ticker, columns.dates, columns.closes]).where(columns.ticker.in_(tickers[start:start + 500])).with_for_update()
+			for ticker, dates, closes in conn.execute(query):
+				stored[ticker] = _decode(dates, closes)
+		return stored
+
+	def _upsert(self, conn, table, rows):
+		#Inserts rows keyed by ticker, replacing whatever the table already has for those tickers
+		dialect = conn.dialect.name
+		if dialect == 'postgresql':
+			statement = postgresql.insert(table)
+			statement = statement.on_conflict_do_update(index_elements=['ticker'], set_=dict((column.name, statement.excluded[column.name]) for column in table.columns if column.name != 'ticker'))
+		elif dialect == 'sqlite':
+			statement = table.insert().prefix_with('OR REPLACE')
+		else:
+			conn.execute(table.delete().where(table.c.ticker.in_([row['ticker'] for row in rows])))
+			statement = table.insert()
+		conn.execute(statement, rows)
+
+	def version(self):
+		return self._connect().execute(select([self.meta.c.value]).where(self.meta.c.key == 'version')).scalar()
+
+	def delete(self, ticker):
+		self._connect().execute(self.closes.delete().where(self.closes.c.ticker == ticker))
+
+	def tickers(self):
+		return [row[0] for row in self._connect().execute(select([self.closes.c.ticker]).order_by(self.closes.c.ticker))]
+
+
+class PriceRefresher(object):
+	#Revalidates stale tickers off the request thread. A ticker that is already
+	#being refreshed is skipped, so a burst of requests causes one fetch per ticker.
+	def __init__(self, store, fetch_batch, max_workers=1):
+		self.store = store
+		self.fetch_batch = fetch_batch
+		self._executor = ThreadPoolExecutor(max_workers=max_workers)
+		self._in_flight = set()
+		self._lock = threading.Lock()
+
+	def schedule(self, tickers):
+		with self._lock:
+			todo = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self._in_flight]
+			self._in_flight.update(todo)
+		if todo:
+			self._executor.submit(self._refresh, todo)
+		return todo
+
+	def is_refreshing(self, ticker):
+		with self._lock:
+			return ticker in self._in_flight
+
+	def _refresh(self, tickers):
+		try:
+			self.store.put_fetched(self.fetch_batch(tickers))
+		except Exception:
+			logger.exception("Background price refresh failed for %s", tickers)
+		finally:
+			with self._lock:
+				self._in_flight.difference_update(tickers)
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from types import MappingProxyType
+
+#The state income table is read from state_incomes.csv once and then served from memory.
+#The file is only parsed again when its modification time changes, so the numbers
+#can still be updated without restarting the app.
+
+#Share of a state's yearly income we suggest risking each month across five stocks
+MONTHS_OF_INCOME_DIVISOR = 60
+
+
+class StateIncomeError(ValueError):
+	pass
+
+
+def parse_state_incomes(path):
+	import petl as etl
+	table = etl.fromcsv(path)
+	header = tuple(column.strip().lower() for column in etl.header(table))
+	if header != ('state', 'income'):
+		raise StateIncomeError("{} should have a state,income header, found {}".format(path, ",".join(header)))
+	incomes = {}
+	for state, income in etl.data(table):
+		state = state.strip()
+		if not state:
+			raise StateIncomeError("{} has a row without a state".format(path))
+		if state in incomes:
+			raise StateIncomeError("{} lists {} more than once".format(path, state))
+		try:
+			incomes[state] = int(income)
+		except ValueError:
+			raise StateIncomeError("{} has a bad income for {}: {!r}".format(path, state, income))
+		if incomes[state] <= 0:
+			raise StateIncomeError("{} has a non positive income for {}".format(path, state))
+	if not incomes:
+		raise StateIncomeError("{} has no states in it".format(path))
+	return incomes
+
+
+class StateIncomeTable(object):
+	def __init__(self, path, check_interval=5.0):
+		self.path = path
+		self.check_interval = check_interval
+		self._lock = threading.Lock()
+		self._mtime = None
+		self._checked_at = 0
+		self.load()
+
+	def load(self):
+		mtime = os.path.getmtime(self.path)
+		incomes = parse_state_incomes(self.path)
+		monthly = dict((state, int(income/MONTHS_OF_INCOME_DIVISOR)) for state, income in incomes.items())
+		#Swap everything in at once so readers never see half a table
+		self._data = (MappingProxyType(incomes), MappingProxyType(monthly), tuple((state, state) for state in incomes))
+		self._mtime = mtime
+		self._checked_at = time.time()
+
+	def _current(self):
+		now = time.time()
+		if now - self._checked_at >= self.check_interval:
+			with self._lock:
+				if now - self._checked_at >= self.check_interval:
+					self._checked_at = now
+					try:
+						if os.path.getmtime(self.path) != self._mtime:
+							self.load()
+					except (OSError, StateIncomeError):
+						#Keep serving the last good table if the file is missing or half written
+						pass
+		return self._data
+
+	@property
+	def incomes(self):
+		return self._current()[0]
+
+	def income(self, state):
+		return self._current()[0][state]
+
+	def monthly_investment(self, state):
+		return self._current()[1][state]
+
+	def choices(self):
+		return list(self._current()[2])
+
+	def __contains__(self, state):
+		return state in self._current()[0]
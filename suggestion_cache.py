@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+
+#In memory cache of ranked suggestions keyed on (state, price snapshot version, catalog version).
+#Keys from an older snapshot can never be hit again, so they are dropped as soon as
+#a newer snapshot shows up instead of waiting to fall off the end of the LRU.
+
+
+class SuggestionCache(object):
+	def __init__(self, max_entries=128):
+		self.max_entries = max_entries
+		self._entries = OrderedDict()
+		self._snapshot = None
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, key):
+		with self._lock:
+			value = self._entries.get(key)
+			if value is None:
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return value
+
+	def put(self, key, value):
+		snapshot = key[1:]
+		with self._lock:
+			if snapshot != self._snapshot:
+				if self._snapshot is not None and snapshot[0] < self._snapshot[0]:
+					#A slower request finished with an older snapshot, keep the newer entries
+					return
+				self._entries.clear()
+				self._snapshot = snapshot
+			self._entries[key] = value
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def invalidate(self):
+		with self._lock:
+			self._entries.clear()
+			self._snapshot = None
@@ -0,0 +1,55 @@
+import numpy as np
+
+#Array version of the suggestion math. Current and previous closes live in two
+#int arrays (one slot per business) so the stop loss, share counts and ranking for
+#one state or many states come out of a few numpy calls instead of a python loop.
+
+#roughly middle ground value, states at or above it get the most expensive stocks first
+RICH_STATE_THRESHOLD = 967
+SUGGESTIONS_PER_REQUEST = 9
+
+
+def price_arrays(stock_prices):
+	#stock_prices is a list of (current close, previous close) pairs
+	prices = np.asarray(stock_prices, dtype=np.int64).reshape(-1, 2)
+	return prices[:, 0], prices[:, 1]
+
+def stop_losses(current, previous):
+	#A drop since yesterday (or no change) means the whole price is at risk
+	stoploss = current - previous
+	return np.where(stoploss > 0, stoploss, current)
+
+def shares_to_buy(investing_money, stoploss):
+	if np.any(stoploss == 0):
+		raise ZeroDivisionError("a stop loss of zero can't be used to size a position")
+	#true division then truncation, same as int(Investing_Money/stoploss)
+	return (np.asarray(investing_money, dtype=np.float64) / stoploss).astype(np.int64)
+
+def top_indices(keys, top=SUGGESTIONS_PER_REQUEST):
+	#Indices of the `top` smallest keys, ties going to the lower index the way a stable sort would.
+	#argpartition finds the cut off without sorting everything, then only the rows at or
+	#under the cut off get sorted.
+	count = len(keys)
+	if count <= top:
+		return np.lexsort((np.arange(count), keys))
+	cutoff = keys[np.argpartition(keys, top - 1)[:top]].max()
+	candidates = np.flatnonzero(keys <= cutoff)
+	return candidates[np.lexsort((candidates, keys[candidates]))][:top]
+
+def rank(current, previous, investing_money, top=SUGGESTIONS_PER_REQUEST):
+	#Returns (indices of the suggested businesses in order, number of shares for each)
+	if investing_money >= RICH_STATE_THRESHOLD:
+		chosen = top_indices(-current, top)
+	else:
+		chosen = top_indices(current, top)
+	return chosen, shares_to_buy(investing_money, stop_losses(current[chosen], previous[chosen]))
+
+def rank_many(current, previous, investing_moneys, top=SUGGESTIONS_PER_REQUEST):
+	#Same as rank for a whole list of states at once. There are only two possible orderings
+	#so each is worked out once and every state just picks one.
+	investing_moneys = np.asarray(investing_moneys, dtype=np.int64)
+	stoploss = stop_losses(current, previous)
+	richest_first = top_indices(-current, top)
+	cheapest_first = top_indices(current, top)
+	chosen = np.where((investing_moneys >= RICH_STATE_THRESHOLD)[:, None], richest_first[None, :], cheapest_first[None, :])
+	return chosen, shares_to_buy(investing_moneys[:, None], stoploss[chosen])
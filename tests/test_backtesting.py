@@ -0,0 +1,39 @@
+import unittest
+from array import array
+
+from market_data import PriceRecord
+import backtesting
+
+
+def record(*days):
+	#days are (date, close) pairs, newest first
+	return PriceRecord(tuple(day for day, close in days), array('d', [close for day, close in days]))
+
+
+class RunTest(unittest.TestCase):
+	def test_entry_is_the_real_close_not_the_price_shown(self):
+		#The page showed int(100.9) = 100, flat closes afterwards are no gain
+		records = {'VZ': record(('2018-03-23', 100.9), ('2018-03-22', 100.9), ('2018-03-21', 100.9), ('2018-03-20', 99.5))}
+		result = backtesting.run(([1], ['2018-03-21']), ([1], ['VZ'], [3], [100]), records, horizon=2)
+		self.assertEqual(result.days_held.tolist(), [2])
+		self.assertEqual(result.hold_return.tolist(), [0.0])
+		self.assertEqual(result.stops_hit.tolist(), [0])
+
+	def test_stop_comes_from_the_entry_close(self):
+		#Up 1.4 the day before entry, so the stop sits at 100.9 - 1.4 = 99.5
+		records = {'VZ': record(('2018-03-23', 99.0), ('2018-03-22', 99.6), ('2018-03-21', 100.9), ('2018-03-20', 99.5))}
+		result = backtesting.run(([1], ['2018-03-21']), ([1], ['VZ'], [2], [100]), records, horizon=2)
+		self.assertEqual(result.stops_hit.tolist(), [1])
+		self.assertAlmostEqual(result.hold_return[0], 99.0 / 100.9 - 1)
+		self.assertAlmostEqual(result.stop_return[0], 99.0 / 100.9 - 1)
+
+	def test_items_without_an_entry_close_are_skipped(self):
+		records = {'VZ': record(('2018-03-23', 101.0), ('2018-03-22', 100.0))}
+		result = backtesting.run(([1, 2], ['2018-03-22', '2018-03-01']), ([1, 1, 2], ['VZ', 'XOM', 'VZ'], [1, 1, 1], [100, 80, 100]), records)
+		self.assertEqual(result.suggestion_ids.tolist(), [1])
+		self.assertEqual(result.skipped_positions, 2)
+		self.assertAlmostEqual(result.hold_return[0], 0.01)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask, g
+from sqlalchemy import event
+
+from db_routing import RoutingSQLAlchemy, REPLICA_BIND
+
+db = RoutingSQLAlchemy()
+
+
+class Note(db.Model):
+	__tablename__ = 'notes'
+	id = db.Column(db.Integer, primary_key=True)
+	text = db.Column(db.String(64))
+
+
+class RoutingSessionTest(unittest.TestCase):
+	#Two sqlite files stand in for the primary and its replica, every statement is logged with the database it ran on
+	def setUp(self):
+		self.work_dir = tempfile.mkdtemp()
+		self.app = Flask(__name__)
+		self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.work_dir, 'primary.db')
+		self.app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: 'sqlite:///' + os.path.join(self.work_dir, 'replica.db')}
+		self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+		db.init_app(self.app)
+		self.context = self.app.app_context()
+		self.context.push()
+		self.statements = []
+		self.engines = []
+		for name, bind in (('primary', None), ('replica', REPLICA_BIND)):
+			engine = db.get_engine(self.app, bind)
+			self.engines.append(engine)
+			db.Model.metadata.create_all(engine)
+			engine.execute(Note.__table__.insert().values(id=1, text='from the ' + name))
+			event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, parameters, context, executemany, name=name: self.statements.append((name, statement.split()[0])))
+
+	def tearDown(self):
+		db.session.remove()
+		self.context.pop()
+		for engine in self.engines:
+			engine.dispose()
+		shutil.rmtree(self.work_dir)
+
+	def databases(self):
+		return sorted(set(name for name, statement in self.statements))
+
+	def test_reads_go_to_the_primary_by_default(self):
+		self.assertEqual(Note.query.get(1).text, 'from the primary')
+		self.assertEqual(self.databases(), ['primary'])
+
+	def test_read_only_reads_go_to_the_replica(self):
+		g.read_only = True
+		self.assertEqual(Note.query.get(1).text, 'from the replica')
+		self.assertEqual(db.session.execute(Note.__table__.select()).fetchall()[0].text, 'from the replica')
+		self.assertEqual(self.databases(), ['replica'])
+		self.assertFalse(db.session().has_writes())
+
+	def test_writes_and_later_reads_go_to_the_primary(self):
+		g.read_only = True
+		db.session.add(Note(id=2, text='new'))
+		#Autoflush sends the pending insert to the primary, and the read follows it there
+		self.assertEqual(Note.query.count(), 2)
+		self.assertEqual(Note.query.get(1).text, 'from the primary')
+		self.assertEqual(self.databases(), ['primary'])
+		self.assertTrue(db.session().has_writes())
+		db.session.commit()
+		self.assertFalse(db.session().has_writes())
+		#A new transaction that only reads is back on the replica
+		del self.statements[:]
+		self.assertEqual(Note.query.count(), 1)
+		self.assertEqual(self.databases(), ['replica'])
+
+	def test_core_writes_count_as_writes(self):
+		g.read_only = True
+		db.session.execute(Note.__table__.update().values(text='changed'))
+		self.assertTrue(db.session().has_writes())
+		self.assertEqual(Note.query.get(1).text, 'changed')
+		self.assertEqual(self.databases(), ['primary'])
+
+	def test_without_a_replica_everything_uses_the_primary(self):
+		self.app.config['SQLALCHEMY_BINDS'] = None
+		g.read_only = True
+		self.assertEqual(Note.query.get(1).text, 'from the primary')
+		self.assertEqual(self.databases(), ['primary'])
+
+
+class AppRoutingTest(unittest.TestCase):
+	#The app itself: read only pages query the replica, everything else and every POST the primary
+	def setUp(self):
+		import Final_Project
+		self.F = Final_Project
+		self.work_dir = tempfile.mkdtemp()
+		environ = dict(DATABASE_URL='sqlite:///' + os.path.join(self.work_dir, 'primary.db'), REPLICA_DATABASE_URL='sqlite:///' + os.path.join(self.work_dir, 'replica.db'))
+		with mock.patch.dict(os.environ, environ):
+			self.app = Final_Project.create_app(dict(WTF_CSRF_ENABLED=False, PROFILE_IMAGE_DIR=os.path.join(self.work_dir, 'profile_images'), MARKET_DATA_PROVIDER='synthetic'))
+		with self.app.app_context():
+			Final_Project.db.create_all()
+			Final_Project.seed_business_catalog(Final_Project.HardCoded_Companies)
+			investor = Final_Project.Investor(username='investor', email='investor@example.com', password='pw')
+			Final_Project.db.session.add(investor)
+			Final_Project.db.session.commit()
+			Final_Project.copy_to_replica(quiet=True)
+			self.primary = Final_Project.db.get_engine(self.app)
+			self.replica = Final_Project.db.get_engine(self.app, REPLICA_BIND)
+		#Lets a page show which database it read from
+		self.replica.execute("UPDATE businesses SET company_name = 'Replica ' || company_name")
+		self.statements = []
+		for name, engine in (('primary', self.primary), ('replica', self.replica)):
+			event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, parameters, context, executemany, name=name: self.statements.append(name))
+		self.client = self.app.test_client()
+
+	def tearDown(self):
+		for engine in (self.primary, self.replica):
+			engine.dispose()
+		shutil.rmtree(self.work_dir)
+
+	def request(self, method, url, **kwargs):
+		del self.statements[:]
+		response = self.client.open(url, method=method, **kwargs)
+		return response, sorted(set(self.statements))
+
+	def test_read_only_page_uses_the_replica(self):
+		response, databases = self.request('GET', '/the_perks')
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('Replica Verizon', response.get_data(as_text=True))
+		self.assertEqual(databases, ['replica'])
+
+	def test_post_to_a_read_only_page_uses_the_primary(self):
+		response, databases = self.request('POST', '/the_perks')
+		self.assertNotIn('Replica', response.get_data(as_text=True))
+		self.assertEqual(databases, ['primary'])
+
+	def test_other_pages_use_the_primary(self):
+		response, databases = self.request('POST', '/Investor_Login', data=dict(email='investor@example.com', password='pw'))
+		self.assertEqual(response.status_code, 302)
+		self.assertEqual(databases, ['primary'])
+		#Logged in, a read only page still reads the replica apart from loading the investor
+		response, databases = self.request('GET', '/Business_Data_At_Your_Fingertips')
+		self.assertIn('Replica Verizon', response.get_data(as_text=True))
+		self.assertIn('replica', databases)
+
+	def test_reads_stay_on_the_primary_after_a_write(self):
+		self.request('POST', '/Investor_Login', data=dict(email='investor@example.com', password='pw'))
+		response, databases = self.request('POST', '/User_Investment_Suggestions', data=dict(State='michigan', New_Data_Request='no'))
+		self.assertEqual(response.status_code, 200)
+		#The replica hasn't got the new suggestion, the history page right after has to read the primary
+		response, databases = self.request('GET', '/Suggestion_History')
+		self.assertEqual(databases, ['primary'])
+		with self.client.session_transaction() as session:
+			session['primary_until'] = 0
+		response, databases = self.request('GET', '/Suggestion_History')
+		self.assertIn('replica', databases)
+
+
+if __name__ == '__main__':
+	unittest.main()
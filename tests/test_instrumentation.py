@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, event, exc
+
+from instrumentation import Registry, RequestTimer, server_timing
+
+
+class WatchEngineTest(unittest.TestCase):
+	def setUp(self):
+		self.engine = create_engine('sqlite://')
+		self.registry = Registry()
+		self.timer = RequestTimer(self.registry)
+		self.timer.watch_engine(self.engine, event)
+
+	def tearDown(self):
+		self.engine.dispose()
+
+	def test_queries_are_counted_and_timed_per_request(self):
+		self.timer.start_request()
+		with self.engine.connect() as conn:
+			for _ in range(3):
+				conn.execute('SELECT 1')
+		spans, queries = self.timer.finish_request()
+		self.assertEqual(queries, 3)
+		self.assertIn('sql', spans)
+		self.assertIn('sql;dur=', server_timing(spans, queries))
+		self.assertIn('app_sql_queries_total 3', self.registry.render())
+
+	def test_failed_statements_leave_nothing_on_the_connection(self):
+		with self.engine.connect() as conn:
+			info_before = dict(conn.info)
+			for _ in range(5):
+				with self.assertRaises(exc.OperationalError):
+					conn.execute('SELECT * FROM no_such_table')
+			#and the next good statement is still timed from its own start
+			self.timer.start_request()
+			conn.execute('SELECT 1')
+			spans, queries = self.timer.finish_request()
+			self.assertEqual(dict(conn.info), info_before)
+		self.assertEqual(queries, 1)
+		self.assertLess(spans['sql'], 1.0)
+
+
+class MetricsRouteTest(unittest.TestCase):
+	def setUp(self):
+		self.work_dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.work_dir)
+
+	def client(self, **config):
+		import Final_Project
+		#The database url is read before create_app's overrides are applied
+		with mock.patch.dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(self.work_dir, 'app.db')):
+			app = Final_Project.create_app(dict(config, PROFILE_IMAGE_DIR=os.path.join(self.work_dir, 'profile_images')))
+		return app.test_client()
+
+	def test_metrics_and_timings_are_off_by_default(self):
+		client = self.client()
+		self.assertEqual(client.get('/metrics').status_code, 404)
+		self.assertNotIn('Server-Timing', client.get('/metrics').headers)
+
+	def test_metrics_token_is_required_when_set(self):
+		client = self.client(METRICS_ENABLED=True, METRICS_TOKEN='s3cret')
+		self.assertEqual(client.get('/metrics').status_code, 401)
+		self.assertEqual(client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+		response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(b'app_span_seconds', response.data)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import login_security
+from login_security import LoginThrottle, PasswordHasher, HashingBusy
+
+
+class LoginThrottleTest(unittest.TestCase):
+	def test_blocks_once_the_limit_is_used_up(self):
+		throttle = LoginThrottle(window=60)
+		for _ in range(3):
+			self.assertFalse(throttle.is_blocked({'account:a': 3}))
+			throttle.record_failure(['account:a'])
+		self.assertTrue(throttle.is_blocked({'account:a': 3}))
+		self.assertFalse(throttle.is_blocked({'account:b': 3}))
+		throttle.reset('account:a')
+		self.assertFalse(throttle.is_blocked({'account:a': 3}))
+
+	def test_expired_keys_are_dropped_on_write(self):
+		throttle = LoginThrottle(window=60)
+		with mock.patch.object(login_security.time, 'time', return_value=1000.0):
+			for number in range(50):
+				throttle.record_failure(['account:{}'.format(number)])
+		self.assertEqual(len(throttle), 50)
+		#Nobody checks those accounts again, the next failure after the window clears them anyway
+		with mock.patch.object(login_security.time, 'time', return_value=1061.0):
+			throttle.record_failure(['account:new'])
+		self.assertEqual(len(throttle), 1)
+
+	def test_key_count_is_capped(self):
+		throttle = LoginThrottle(window=60, max_keys=10)
+		for number in range(100):
+			throttle.record_failure(['account:{}'.format(number)])
+		self.assertEqual(len(throttle), 10)
+		#The least recently failed keys are the ones forgotten
+		self.assertEqual(throttle.failures('account:99'), 1)
+		self.assertEqual(throttle.failures('account:0'), 0)
+
+
+def slow_hash(delay):
+	time.sleep(delay)
+	return 'done'
+
+
+class PasswordHasherTest(unittest.TestCase):
+	def test_one_deadline_for_the_slot_and_the_hash(self):
+		hasher = PasswordHasher(workers=1, max_pending=1, timeout=1.0)
+		hasher._run(slow_hash, 0)
+		#Holds the only slot for most of the timeout, the second hash gets what is left of it
+		blocker = threading.Thread(target=hasher._run, args=(slow_hash, 0.7))
+		blocker.start()
+		time.sleep(0.1)
+		started = time.time()
+		with self.assertRaises(HashingBusy):
+			hasher._run(slow_hash, 2.0)
+		self.assertLess(time.time() - started, 1.3)
+		blocker.join()
+
+	def test_hash_and_verify(self):
+		hasher = PasswordHasher('pbkdf2:sha256:1000', workers=0)
+		pwhash = hasher.hash('secret')
+		self.assertTrue(hasher.verify(pwhash, 'secret'))
+		self.assertFalse(hasher.verify(pwhash, 'wrong'))
+		self.assertFalse(hasher.needs_rehash(pwhash))
+		self.assertTrue(PasswordHasher('pbkdf2:sha256:2000', workers=0).needs_rehash(pwhash))
+
+
+if __name__ == '__main__':
+	unittest.main()
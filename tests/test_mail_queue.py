@@ -0,0 +1,170 @@
+import os
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from email.message import EmailMessage
+from unittest import mock
+
+with warnings.catch_warnings():
+	warnings.simplefilter('ignore', DeprecationWarning)
+	try:
+		import asyncore
+		import smtpd
+	except ImportError:
+		#Both left the standard library in python 3.12
+		smtpd = None
+
+from mail_queue import MailQueue
+
+
+class DebuggingServer(object):
+	#A local smtp server in a thread of its own. It keeps every message it accepts, counts
+	#connections, and refuses mail for any address starting with "refuse"
+	def __init__(self):
+		self.map = {}
+		self.messages = []
+		self.connections = 0
+		debugging_server = self
+
+		class Server(smtpd.SMTPServer):
+			def handle_accepted(self, conn, addr):
+				debugging_server.connections += 1
+				smtpd.SMTPChannel(self, conn, addr, map=debugging_server.map)
+
+			def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+				if any(address.startswith('refuse') for address in rcpttos):
+					return '550 No such mailbox'
+				debugging_server.messages.append((rcpttos, data))
+
+		self.server = Server(('127.0.0.1', 0), None, map=self.map)
+		self.port = self.server.socket.getsockname()[1]
+		self.thread = threading.Thread(target=asyncore.loop, kwargs=dict(timeout=0.05, map=self.map))
+		self.thread.daemon = True
+		self.thread.start()
+
+	def close(self):
+		for channel in list(self.map.values()):
+			channel.close()
+		self.thread.join(5)
+
+
+class SMTPConnection(object):
+	#The smallest connection MailQueue can use: a context manager with send(message)
+	def __init__(self, port):
+		self.port = port
+
+	def __enter__(self):
+		self.smtp = smtplib.SMTP('127.0.0.1', self.port, timeout=5)
+		return self
+
+	def send(self, message):
+		self.smtp.sendmail(message['From'], [message['To']], message.as_string())
+
+	def __exit__(self, *exc_info):
+		self.smtp.quit()
+
+
+def render(job):
+	message = EmailMessage()
+	message['From'] = 'app@example.com'
+	message['To'], message['Subject'] = job
+	message.set_content('hello')
+	return message
+
+
+@unittest.skipIf(smtpd is None, 'smtpd is not available')
+class MailQueueTest(unittest.TestCase):
+	def setUp(self):
+		self.smtp = DebuggingServer()
+
+	def tearDown(self):
+		self.smtp.close()
+
+	def test_batches_share_a_connection(self):
+		queue = MailQueue(render, lambda: SMTPConnection(self.smtp.port), batch_size=10, batch_wait=0.5)
+		for number in range(25):
+			self.assertTrue(queue.enqueue(('investor{}@example.com'.format(number), 'Feedback {}'.format(number))))
+		self.assertTrue(queue.flush(10))
+		self.assertEqual(len(self.smtp.messages), 25)
+		stats = queue.stats()
+		self.assertEqual((stats['sent'], stats['failed'], stats['queued']), (25, 0, 0))
+		#25 messages in batches of up to 10 is at least three batches, one connection each
+		self.assertEqual(self.smtp.connections, stats['batches'])
+		self.assertLess(stats['batches'], 25)
+
+	def test_refused_message_does_not_stop_the_batch(self):
+		queue = MailQueue(render, lambda: SMTPConnection(self.smtp.port), batch_wait=0.5)
+		for address in ('first@example.com', 'refuse@example.com', 'last@example.com'):
+			queue.enqueue((address, 'Hi'))
+		self.assertTrue(queue.flush(10))
+		self.assertEqual([recipients for recipients, data in self.smtp.messages], [['first@example.com'], ['last@example.com']])
+		stats = queue.stats()
+		self.assertEqual((stats['sent'], stats['failed'], stats['retried']), (2, 1, 0))
+
+	def test_unreachable_server_is_retried_then_given_up(self):
+		#Nothing listens on the port once the server is closed
+		port = self.smtp.port
+		self.smtp.close()
+		queue = MailQueue(render, lambda: SMTPConnection(port), batch_wait=0.1, retries=2, backoff=0.01)
+		queue.enqueue(('investor@example.com', 'Hi'))
+		self.assertTrue(queue.flush(10))
+		stats = queue.stats()
+		self.assertEqual((stats['sent'], stats['failed'], stats['retried'], stats['connections']), (0, 1, 2, 3))
+
+	def test_full_queue_drops_instead_of_blocking(self):
+		blocked = threading.Event()
+		def connect():
+			blocked.wait(5)
+			return SMTPConnection(self.smtp.port)
+		queue = MailQueue(render, connect, max_size=2, batch_size=1, batch_wait=0)
+		#The worker holds the first message while it waits to connect, the queue fills behind it
+		queue.enqueue(('one@example.com', 'Hi'))
+		while queue.stats()['queued']:
+			time.sleep(0.01)
+		results = [queue.enqueue(('{}@example.com'.format(name), 'Hi')) for name in ('two', 'three', 'four')]
+		self.assertEqual(results, [True, True, False])
+		blocked.set()
+		self.assertTrue(queue.flush(10))
+		self.assertEqual(queue.stats()['dropped'], 1)
+		self.assertEqual(len(self.smtp.messages), 3)
+
+
+@unittest.skipIf(smtpd is None, 'smtpd is not available')
+class AppMailTest(unittest.TestCase):
+	#send_email through the app's own Flask-Mail settings, pointed at the debugging server
+	def setUp(self):
+		import Final_Project
+		self.smtp = DebuggingServer()
+		self.work_dir = tempfile.mkdtemp()
+		#The database url is read before create_app's overrides are applied
+		with mock.patch.dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(self.work_dir, 'app.db')):
+			self.app = Final_Project.create_app(dict(PROFILE_IMAGE_DIR=os.path.join(self.work_dir, 'profile_images'),
+				MAIL_SERVER='127.0.0.1', MAIL_PORT=self.smtp.port, MAIL_USE_TLS=False, MAIL_USERNAME=None, MAIL_PASSWORD=None,
+				FLASKY_MAIL_SENDER='app@example.com', MAIL_BATCH_WAIT=0.2))
+		self.send_email = Final_Project.send_email
+		self.services = Final_Project.services
+
+	def tearDown(self):
+		self.smtp.close()
+		shutil.rmtree(self.work_dir)
+
+	def test_feedback_mail_is_delivered(self):
+		with self.app.test_request_context():
+			for number in range(3):
+				self.assertTrue(self.send_email('admin@example.com', 'Feedback Submitted', 'feedback_submission', feedback=dict(satisfaction='answer {}'.format(number), feedback='hi')))
+		self.assertTrue(self.services(self.app).mail_queue.flush(10))
+		self.assertEqual(len(self.smtp.messages), 3)
+		self.assertEqual(self.smtp.connections, 1)
+		recipients, data = self.smtp.messages[0]
+		self.assertEqual(recipients, ['admin@example.com'])
+		self.assertIn(b'Subject: [Flasky]Feedback Submitted', data)
+		#Rendered on the queue's worker, after the request context is gone
+		self.assertIn(b'<p>answer 0<p>', data)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import market_data
+
+
+class StubQuandl(BaseHTTPRequestHandler):
+	#Answers like the WIKI datasets api: BAD* tickers are unknown, SLOW* ones take longer than any client waits
+	def do_GET(self):
+		server = self.server
+		url = urlparse(self.path)
+		ticker = url.path.rsplit('/', 1)[-1].split('.')[0]
+		with server.lock:
+			server.in_flight += 1
+			server.most_in_flight = max(server.most_in_flight, server.in_flight)
+			server.queries.append(parse_qs(url.query))
+		try:
+			time.sleep(server.slow_delay if ticker.startswith('SLOW') else server.delay)
+			if ticker.startswith('BAD'):
+				body = {"quandl_error": {"code": "QECx02", "message": "You have submitted an incorrect Quandl code."}}
+			else:
+				body = {"dataset": {"dataset_code": ticker, "column_names": ["Date", "Close"], "data": [["2018-03-27", 172.77], ["2018-03-26", 172.8], ["2018-03-23", 164.94]]}}
+			payload = json.dumps(body).encode()
+			self.send_response(200)
+			self.send_header('Content-Type', 'application/json')
+			self.send_header('Content-Length', str(len(payload)))
+			self.end_headers()
+			self.wfile.write(payload)
+		except (BrokenPipeError, ConnectionResetError):
+			#The client gave up waiting
+			pass
+		finally:
+			with server.lock:
+				server.in_flight -= 1
+
+	def log_message(self, format, *args):
+		pass
+
+
+class FetchTest(unittest.TestCase):
+	def setUp(self):
+		#A new server per test is a new host:port, so each test gets its own per host semaphore
+		self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubQuandl)
+		self.server.daemon_threads = True
+		self.server.lock = threading.Lock()
+		self.server.in_flight = 0
+		self.server.most_in_flight = 0
+		self.server.queries = []
+		self.server.delay = 0.05
+		self.server.slow_delay = 1.0
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+		self.base_url = 'http://127.0.0.1:{}/api/v3/datasets/WIKI/{{}}.json'.format(self.server.server_address[1])
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def test_closes_newest_first(self):
+		record = market_data.fetch_quandl_data('AAPL', self.base_url, api_key='secret', rows=3)
+		self.assertEqual(record.dates, ('2018-03-27', '2018-03-26', '2018-03-23'))
+		self.assertEqual(list(record.closes), [172.77, 172.8, 164.94])
+		self.assertEqual(self.server.queries[0], {'rows': ['3'], 'column_index': ['4'], 'api_key': ['secret']})
+
+	def test_unknown_ticker(self):
+		self.assertEqual(market_data.fetch_quandl_data('BADCO', self.base_url), "nope")
+
+	def test_timeout_returns_none(self):
+		started = time.time()
+		self.assertIsNone(market_data.fetch_quandl_data('SLOWCO', self.base_url, timeout=0.2))
+		self.assertLess(time.time() - started, self.server.slow_delay)
+
+	def test_per_host_cap(self):
+		tickers = ['T{}'.format(number) for number in range(12)]
+		fetched = market_data.fetch_many(tickers, self.base_url, max_workers=12, max_per_host=3)
+		self.assertEqual(sorted(fetched), sorted(tickers))
+		self.assertTrue(all(record.closes[0] == 172.77 for record in fetched.values()))
+		self.assertEqual(self.server.most_in_flight, 3)
+
+	def test_fetch_many_mixed(self):
+		started = time.time()
+		fetched = market_data.fetch_many(['AAPL', 'BADCO', 'SLOWCO', 'AAPL'], self.base_url, timeout=0.2)
+		self.assertEqual(sorted(fetched), ['AAPL', 'BADCO', 'SLOWCO'])
+		self.assertEqual(fetched['BADCO'], "nope")
+		self.assertIsNone(fetched['SLOWCO'])
+		self.assertEqual(fetched['AAPL'].closes[0], 172.77)
+		#The calls run side by side, the slow one doesn't hold up the others
+		self.assertLess(time.time() - started, self.server.slow_delay)
+
+
+if __name__ == '__main__':
+	unittest.main()
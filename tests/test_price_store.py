@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+
+from sqlalchemy import MetaData, create_engine
+
+from market_data import PriceRecord
+from price_store import PriceStore, price_tables
+
+
+def record(*days):
+	#days are (date, close) pairs, newest first
+	return PriceRecord(tuple(day for day, close in days), array('d', [close for day, close in days]))
+
+
+class PriceStoreTest(unittest.TestCase):
+	def setUp(self):
+		self.work_dir = tempfile.mkdtemp()
+		self.engine = create_engine('sqlite:///' + os.path.join(self.work_dir, 'prices.db'))
+		self.store = PriceStore(self.engine, price_tables(MetaData()))
+
+	def tearDown(self):
+		self.engine.dispose()
+		shutil.rmtree(self.work_dir)
+
+	def test_new_closes_publish_a_new_snapshot(self):
+		self.assertEqual(self.store.version(), 0)
+		self.assertEqual(self.store.put_many({'VZ': record(('2018-03-27', 47.0), ('2018-03-26', 46.5))}), ['VZ'])
+		self.assertEqual(self.store.version(), 1)
+		self.assertEqual(self.store.put_many({'VZ': record(('2018-03-28', 48.0), ('2018-03-27', 47.0))}), ['VZ'])
+		self.assertEqual(self.store.version(), 2)
+		self.assertEqual(self.store.get('VZ').dates, ('2018-03-28', '2018-03-27', '2018-03-26'))
+
+	def test_refetching_the_same_closes_keeps_the_snapshot(self):
+		records = {'VZ': record(('2018-03-27', 47.0), ('2018-03-26', 46.5)), 'PFE': record(('2018-03-27', 35.5))}
+		self.store.put_many(records)
+		version = self.store.version()
+		fetched_at = self.store.fetched_at(['VZ', 'PFE'])
+		self.assertEqual(self.store.put_many(records), [])
+		#Closes the store already has, even just some of them, change nothing either
+		self.assertEqual(self.store.put_many({'VZ': record(('2018-03-27', 47.0))}), [])
+		self.assertEqual(self.store.version(), version)
+		#but the prices count as fresh again
+		refetched_at = self.store.fetched_at(['VZ', 'PFE'])
+		self.assertGreaterEqual(refetched_at['VZ'], fetched_at['VZ'])
+		self.assertGreaterEqual(refetched_at['PFE'], fetched_at['PFE'])
+
+	def test_a_corrected_close_publishes_a_new_snapshot(self):
+		self.store.put_many({'VZ': record(('2018-03-27', 47.0))})
+		version = self.store.version()
+		self.assertEqual(self.store.put_many({'VZ': record(('2018-03-27', 47.25))}), ['VZ'])
+		self.assertEqual(self.store.version(), version + 1)
+		self.assertEqual(list(self.store.get('VZ').closes), [47.25])
+
+	def test_history_is_capped(self):
+		self.store.history_days = 3
+		self.store.put_many({'VZ': record(('2018-03-22', 45.0), ('2018-03-21', 44.0))})
+		self.store.put_many({'VZ': record(('2018-03-26', 46.5), ('2018-03-23', 46.0))})
+		self.assertEqual(self.store.get('VZ').dates, ('2018-03-26', '2018-03-23', '2018-03-22'))
+		#Older closes than the history keeps don't count as a change
+		version = self.store.version()
+		self.assertEqual(self.store.put_many({'VZ': record(('2018-03-26', 46.5), ('2018-03-20', 43.0))}), [])
+		self.assertEqual(self.store.version(), version)
+
+	def test_misses_are_remembered_until_prices_arrive(self):
+		self.store.put_fetched({'VZ': record(('2018-03-27', 47.0)), 'BADCO': "nope", 'SLOW': None})
+		self.assertEqual(self.store.get_misses(['VZ', 'BADCO', 'SLOW']), {'BADCO': True, 'SLOW': True})
+		self.assertEqual(self.store.version(), 1)
+		self.store.put_fetched({'SLOW': record(('2018-03-27', 10.0))})
+		self.assertEqual(self.store.get_misses(['SLOW']), {})
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,4 @@
+from Final_Project import create_app
+
+#Entry point for gunicorn: gunicorn wsgi:app
+app = create_app()